@@ -4,7 +4,7 @@ from alembic import context
 
 from database import metadata
 from settings import SQLALCHEMY_DATABASE_URL
-from entities import company, user, task
+from entities import company, user, task, refresh_token, job
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
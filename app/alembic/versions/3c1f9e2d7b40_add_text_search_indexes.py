@@ -0,0 +1,58 @@
+"""Add text search indexes
+
+Revision ID: 3c1f9e2d7b40
+Revises: 6a85bff17ea2
+Create Date: 2026-10-18 10:03:51.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9e2d7b40'
+down_revision: Union[str, None] = '6a85bff17ea2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.create_index('ix_companies_name_pattern', 'companies', ['name'], postgresql_ops={'name': 'text_pattern_ops'})
+    op.create_index('ix_companies_description_pattern', 'companies', ['description'], postgresql_ops={'description': 'text_pattern_ops'})
+    op.create_index('ix_companies_name_trgm', 'companies', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_companies_description_trgm', 'companies', ['description'], postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'})
+    op.create_index('ix_tasks_summary_pattern', 'tasks', ['summary'], postgresql_ops={'summary': 'text_pattern_ops'})
+    op.create_index('ix_tasks_description_pattern', 'tasks', ['description'], postgresql_ops={'description': 'text_pattern_ops'})
+    op.create_index('ix_tasks_summary_trgm', 'tasks', ['summary'], postgresql_using='gin', postgresql_ops={'summary': 'gin_trgm_ops'})
+    op.create_index('ix_tasks_description_trgm', 'tasks', ['description'], postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'})
+    op.create_index('ix_users_email_pattern', 'users', ['email'], postgresql_ops={'email': 'text_pattern_ops'})
+    op.create_index('ix_users_username_pattern', 'users', ['username'], postgresql_ops={'username': 'text_pattern_ops'})
+    op.create_index('ix_users_first_name_pattern', 'users', ['first_name'], postgresql_ops={'first_name': 'text_pattern_ops'})
+    op.create_index('ix_users_last_name_pattern', 'users', ['last_name'], postgresql_ops={'last_name': 'text_pattern_ops'})
+    op.create_index('ix_users_email_trgm', 'users', ['email'], postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('ix_users_username_trgm', 'users', ['username'], postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'})
+    op.create_index('ix_users_first_name_trgm', 'users', ['first_name'], postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'})
+    op.create_index('ix_users_last_name_trgm', 'users', ['last_name'], postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_last_name_trgm', table_name='users')
+    op.drop_index('ix_users_first_name_trgm', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
+    op.drop_index('ix_users_email_trgm', table_name='users')
+    op.drop_index('ix_users_last_name_pattern', table_name='users')
+    op.drop_index('ix_users_first_name_pattern', table_name='users')
+    op.drop_index('ix_users_username_pattern', table_name='users')
+    op.drop_index('ix_users_email_pattern', table_name='users')
+    op.drop_index('ix_tasks_description_trgm', table_name='tasks')
+    op.drop_index('ix_tasks_summary_trgm', table_name='tasks')
+    op.drop_index('ix_tasks_description_pattern', table_name='tasks')
+    op.drop_index('ix_tasks_summary_pattern', table_name='tasks')
+    op.drop_index('ix_companies_description_trgm', table_name='companies')
+    op.drop_index('ix_companies_name_trgm', table_name='companies')
+    op.drop_index('ix_companies_description_pattern', table_name='companies')
+    op.drop_index('ix_companies_name_pattern', table_name='companies')
+    op.execute("DROP EXTENSION IF EXISTS pg_trgm;")
@@ -0,0 +1,38 @@
+"""Create jobs table
+
+Revision ID: 5f2c8e9a4b17
+Revises: e4a1d7c0b962
+Create Date: 2026-10-18 15:02:44.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8e9a4b17'
+down_revision: Union[str, None] = 'e4a1d7c0b962'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.UUID, nullable=False, primary_key=True),
+    sa.Column('name', sa.String, nullable=False),
+    sa.Column('payload', sa.JSON, nullable=False),
+    sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+    sa.Column('run_at', sa.DateTime, nullable=False),
+    sa.Column('last_error', sa.String, nullable=True),
+    sa.Column('failed_at', sa.DateTime, nullable=True),
+    sa.Column('created_at', sa.DateTime, nullable=False),
+    sa.Column('updated_at', sa.DateTime, nullable=False),
+    )
+    op.create_index('ix_jobs_pending_run_at', 'jobs', ['run_at'], postgresql_where=sa.text('failed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_pending_run_at', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,30 @@
+"""Add keyset pagination indexes
+
+Revision ID: 6a85bff17ea2
+Revises: ff81659f8c02
+Create Date: 2026-10-18 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a85bff17ea2'
+down_revision: Union[str, None] = 'ff81659f8c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_companies_created_at_id', 'companies', ['created_at', 'id'])
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_companies_created_at_id', table_name='companies')
@@ -0,0 +1,65 @@
+"""Add company stats materialized view
+
+Revision ID: 8d4b2f6a1c93
+Revises: 3c1f9e2d7b40
+Create Date: 2026-10-18 12:10:27.415308
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b2f6a1c93'
+down_revision: Union[str, None] = '3c1f9e2d7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE MATERIALIZED VIEW company_stats AS
+        SELECT companies.id AS company_id,
+               COALESCE(user_stats.user_count, 0) AS user_count,
+               COALESCE(user_stats.active_user_count, 0) AS active_user_count,
+               COALESCE(user_stats.admin_count, 0) AS admin_count,
+               COALESCE(task_stats.task_count, 0) AS task_count,
+               COALESCE(task_stats.created_task_count, 0) AS created_task_count,
+               COALESCE(task_stats.started_task_count, 0) AS started_task_count,
+               COALESCE(task_stats.blocked_task_count, 0) AS blocked_task_count,
+               COALESCE(task_stats.completed_task_count, 0) AS completed_task_count,
+               COALESCE(task_stats.cancelled_task_count, 0) AS cancelled_task_count,
+               COALESCE(task_stats.priority_sum, 0) AS priority_sum,
+               now() AS refreshed_at
+        FROM companies
+        LEFT JOIN (
+            SELECT company_id,
+                   count(*) AS user_count,
+                   count(*) FILTER (WHERE is_active) AS active_user_count,
+                   count(*) FILTER (WHERE is_admin) AS admin_count
+            FROM users
+            GROUP BY company_id
+        ) AS user_stats ON user_stats.company_id = companies.id
+        LEFT JOIN (
+            SELECT users.company_id,
+                   count(*) AS task_count,
+                   count(*) FILTER (WHERE tasks.status = 'CREATED') AS created_task_count,
+                   count(*) FILTER (WHERE tasks.status = 'STARTED') AS started_task_count,
+                   count(*) FILTER (WHERE tasks.status = 'BLOCKED') AS blocked_task_count,
+                   count(*) FILTER (WHERE tasks.status = 'COMPLETED') AS completed_task_count,
+                   count(*) FILTER (WHERE tasks.status = 'CANCELLED') AS cancelled_task_count,
+                   sum(tasks.priority) AS priority_sum
+            FROM tasks
+            JOIN users ON users.id = tasks.user_id
+            GROUP BY users.company_id
+        ) AS task_stats ON task_stats.company_id = companies.id;
+    """)
+    # REFRESH MATERIALIZED VIEW CONCURRENTLY requires a unique index
+    op.create_index('ix_company_stats_company_id', 'company_stats', ['company_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_company_stats_company_id', table_name='company_stats')
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS company_stats;")
@@ -0,0 +1,42 @@
+"""Add foreign key and filter indexes
+
+Revision ID: b7e3c9a15d24
+Revises: 8d4b2f6a1c93
+Create Date: 2026-10-18 12:58:04.731562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c9a15d24'
+down_revision: Union[str, None] = '8d4b2f6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Foreign keys, checked on every company / user delete and used by the ?include= loaders
+    op.create_index('ix_users_company_id', 'users', ['company_id'])
+    op.create_index('ix_tasks_user_id', 'tasks', ['user_id'])
+    # Equality filters lead, followed by the (created_at, id) pagination order
+    op.create_index('ix_companies_mode_created_at_id', 'companies', ['mode', 'created_at', 'id'])
+    op.create_index('ix_tasks_status_created_at_id', 'tasks', ['status', 'created_at', 'id'])
+    op.create_index('ix_companies_rating', 'companies', ['rating'])
+    op.create_index('ix_tasks_priority', 'tasks', ['priority'])
+    op.create_index('ix_users_active_created_at_id', 'users', ['created_at', 'id'], postgresql_where=sa.text('is_active'))
+    op.create_index('ix_tasks_open_created_at_id', 'tasks', ['created_at', 'id'], postgresql_where=sa.text("status IN ('CREATED', 'STARTED', 'BLOCKED')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_open_created_at_id', table_name='tasks')
+    op.drop_index('ix_users_active_created_at_id', table_name='users')
+    op.drop_index('ix_tasks_priority', table_name='tasks')
+    op.drop_index('ix_companies_rating', table_name='companies')
+    op.drop_index('ix_tasks_status_created_at_id', table_name='tasks')
+    op.drop_index('ix_companies_mode_created_at_id', table_name='companies')
+    op.drop_index('ix_tasks_user_id', table_name='tasks')
+    op.drop_index('ix_users_company_id', table_name='users')
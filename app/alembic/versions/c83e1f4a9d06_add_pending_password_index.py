@@ -0,0 +1,27 @@
+"""Add pending password index
+
+Revision ID: c83e1f4a9d06
+Revises: 5f2c8e9a4b17
+Create Date: 2026-10-18 16:40:12.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c83e1f4a9d06'
+down_revision: Union[str, None] = '5f2c8e9a4b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only holds the users whose default password hashing job is still pending
+    op.create_index('ix_users_pending_password_created_at', 'users', ['created_at'], postgresql_where=sa.text("hashed_password = '!pending'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_pending_password_created_at', table_name='users')
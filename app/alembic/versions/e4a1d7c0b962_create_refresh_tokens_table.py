@@ -0,0 +1,45 @@
+"""Create refresh tokens table
+
+Revision ID: e4a1d7c0b962
+Revises: b7e3c9a15d24
+Create Date: 2026-10-18 14:21:37.902184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a1d7c0b962'
+down_revision: Union[str, None] = 'b7e3c9a15d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('refresh_tokens',
+    sa.Column('id', sa.UUID, nullable=False, primary_key=True),
+    sa.Column('token_hash', sa.String, nullable=False),
+    sa.Column('family_id', sa.UUID, nullable=False),
+    sa.Column('user_id', sa.UUID, nullable=False),
+    sa.Column('expires_at', sa.DateTime, nullable=False),
+    sa.Column('used_at', sa.DateTime, nullable=True),
+    sa.Column('revoked_at', sa.DateTime, nullable=True),
+    sa.Column('created_at', sa.DateTime, nullable=False),
+    sa.Column('updated_at', sa.DateTime, nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_refresh_tokens_family_id'), 'refresh_tokens', ['family_id'])
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'])
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_family_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
@@ -0,0 +1,116 @@
+"""Username allocation load test
+
+Creates many users with the same first and last name concurrently through
+UserService.create_user and checks that every user got a distinct username.
+
+Run from the `app` directory against a migrated PostgreSQL database:
+
+    python -m benchmarks.create_users --count 10000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from passlib.context import CryptContext
+from sqlalchemy import delete, event, func, select
+
+import entities.user
+from database import AsyncSessionLocal, async_engine
+from entities.company import Company
+from entities.user import User
+from models.user import CreateUserModel
+from services import user as UserService
+from services import utils
+from services.jobs import job_queue
+
+
+async def create_company() -> Company:
+    async with AsyncSessionLocal() as db:
+        company = Company(
+            name="LoadTest",
+            description="Username allocation load test",
+            created_at=utils.get_current_utc_time(),
+            updated_at=utils.get_current_utc_time(),
+        )
+        db.add(company)
+        await db.commit()
+        await db.refresh(company)
+        return company
+
+
+async def worker(queue: asyncio.Queue, data: CreateUserModel, latencies: list) -> None:
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await UserService.create_user(data, db)
+        latencies.append(time.perf_counter() - started)
+
+
+async def main(args) -> None:
+    # The load test targets username allocation, so bcrypt is run with its
+    # cheapest cost factor to keep the background hashing jobs short.
+    entities.user.bcrypt_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.bcrypt_rounds)
+    
+    statements = 0
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    
+    company = await create_company()
+    data = CreateUserModel(first_name=args.first_name, last_name=args.last_name, company_id=company.id)
+    
+    queue = asyncio.Queue()
+    for index in range(args.count):
+        queue.put_nowait(index)
+    
+    latencies = []
+    await job_queue.start()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(queue, data, latencies) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    
+    # The default passwords are hashed by background jobs, off the create path
+    await job_queue.stop()
+    drained = time.perf_counter() - started
+    
+    async with AsyncSessionLocal() as db:
+        total, distinct = (await db.execute(
+            select(func.count(User.id), func.count(func.distinct(User.username)))
+            .filter(User.company_id == company.id)
+        )).one()
+        
+        if not args.keep:
+            await db.execute(delete(User).filter(User.company_id == company.id))
+            await db.execute(delete(Company).filter(Company.id == company.id))
+            await db.commit()
+    
+    latencies.sort()
+    print(f"users created:       {total} ({distinct} distinct usernames)")
+    print(f"elapsed:             {elapsed:.2f} s ({total / elapsed:.1f} users/s)")
+    print(f"latency p50 / p99:   {latencies[len(latencies) // 2] * 1000:.1f} / {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"jobs drained after:  {drained:.2f} s")
+    print(f"statements / create: {statements / total:.2f}")
+    print(f"username conflicts:  {int(UserService.username_conflicts.value())}")
+    
+    await async_engine.dispose()
+    
+    if total != args.count or distinct != total:
+        raise SystemExit("Username allocation produced duplicates or lost users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="number of users to create")
+    parser.add_argument("--concurrency", type=int, default=50, help="number of concurrent create_user calls")
+    parser.add_argument("--first-name", default="John")
+    parser.add_argument("--last-name", default="Smith")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="bcrypt cost factor used while loading")
+    parser.add_argument("--keep", action="store_true", help="keep the created users and company")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,318 @@
+"""Endpoint load benchmark
+
+Drives every router endpoint through the application in process, calling the
+ASGI app directly without a server or a socket, with a fixed number of
+concurrent clients. The latency percentiles, throughput and error count of
+each endpoint are recorded as JSON. Comparing the output against a
+previous run, e.g. the last release on the same seeded database, reports
+the endpoints whose p95 latency regressed.
+
+Write endpoints run on records created by the benchmark itself. The seeded
+records are only read. Run from the `app` directory against a database
+filled with `python -m cli.seed`:
+
+    python -m benchmarks.load --requests 500 --concurrency 20 --output baseline.json
+    python -m benchmarks.load --requests 500 --concurrency 20 --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import math
+import random
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+from cli.seed import ADMIN_USERNAME
+from database import async_engine
+from main import app
+from routers import auth
+from services import rate_limit
+from settings import METRICS_TOKEN
+
+RESOURCES = ("companies", "users", "tasks")
+
+
+async def call(method: str, path: str, headers: dict, body: bytes = b"") -> tuple[int, bytes]:
+    """Send one HTTP request to the ASGI application and collect the response"""
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    sent = False
+    status = None
+    chunks = []
+    
+    async def receive() -> dict:
+        nonlocal sent
+        if sent:
+            # The client never disconnects, streaming responses cancel this wait once done
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The error middleware answers with a 500 before re-raising, count it like a server would
+        if status is None:
+            raise
+    return status, b"".join(chunks)
+
+
+class Context:
+    """State shared by the scenarios: credentials, seeded IDs and the records created so far"""
+    
+    def __init__(self, args, headers: dict, samples: dict) -> None:
+        self.args = args
+        self.headers = headers
+        self.samples = samples
+        self.created = {resource: [] for resource in RESOURCES}
+        self.rng = random.Random(0)
+    
+    def sample(self, resource: str) -> str:
+        return self.rng.choice(self.samples[resource])
+    
+    def any_created(self, resource: str) -> str:
+        return self.rng.choice(self.created[resource])
+    
+    def take_created(self, resource: str, count: int = None) -> str | list:
+        if count is None:
+            return self.created[resource].pop()
+        taken, self.created[resource] = self.created[resource][-count:], self.created[resource][:-count]
+        return taken
+
+
+def get(path: str):
+    return lambda context: ("GET", path, None)
+
+
+def login_form(args) -> str:
+    return urlencode({"username": args.username, "password": args.password})
+
+
+def bulk_tasks(context: Context) -> list:
+    return [
+        {"summary": "Load test", "description": "benchmarks.load bulk", "user_id": context.sample("users")}
+        for _ in range(10)
+    ]
+
+
+# (name, request builder, resource whose created IDs are kept), the builder
+# returns the method, path and body of the next request, string bodies are
+# sent form encoded and the others as JSON. Scenarios run in order, creations
+# before the updates and deletes that consume their IDs.
+SCENARIOS = [
+    ("GET /", get("/"), None),
+    ("POST /auth/token", lambda context: ("POST", "/auth/token", login_form(context.args)), None),
+    ("GET /companies", get("/companies?size=50"), None),
+    ("GET /companies?mode&rating", get("/companies?mode=ESTABLISHED&rating=3"), None),
+    ("GET /companies?fields", get("/companies?size=50&fields=name,rating"), None),
+    ("GET /companies?include", get("/companies?include=users"), None),
+    ("GET /companies/{id}", lambda context: ("GET", f"/companies/{context.sample('companies')}", None), None),
+    ("GET /companies/{id}/stats", lambda context: ("GET", f"/companies/{context.sample('companies')}/stats", None), None),
+    ("GET /companies/export", get("/companies/export?mode=CLOSED"), None),
+    ("GET /users", get("/users?size=50"), None),
+    ("GET /users?is_active", get("/users?is_active=true"), None),
+    ("GET /users?include", get("/users?include=company"), None),
+    ("GET /users/{id}", lambda context: ("GET", f"/users/{context.sample('users')}", None), None),
+    ("GET /users/export", get("/users/export?is_admin=true"), None),
+    ("GET /tasks", get("/tasks?size=50"), None),
+    ("GET /tasks?status", get("/tasks?status=STARTED"), None),
+    ("GET /tasks?include", get("/tasks?include=user"), None),
+    ("GET /tasks/{id}", lambda context: ("GET", f"/tasks/{context.sample('tasks')}", None), None),
+    ("GET /tasks/export", get("/tasks/export?status=BLOCKED&priority=5"), None),
+    ("GET /stats/tasks", get("/stats/tasks"), None),
+    ("GET /metrics", get("/metrics"), None),
+    ("POST /companies", lambda context: ("POST", "/companies", {"name": "Load test", "description": "benchmarks.load", "mode": "STARTUP"}), "companies"),
+    ("PUT /companies/{id}", lambda context: ("PUT", f"/companies/{context.any_created('companies')}", {"rating": 4}), None),
+    ("POST /users", lambda context: ("POST", "/users", {"first_name": "Load", "last_name": "Test", "company_id": context.sample("companies")}), "users"),
+    ("PUT /users/{id}", lambda context: ("PUT", f"/users/{context.any_created('users')}", {"is_active": True}), None),
+    ("POST /tasks", lambda context: ("POST", "/tasks", {"summary": "Load test", "description": "benchmarks.load", "user_id": context.sample("users")}), "tasks"),
+    ("POST /tasks/bulk", lambda context: ("POST", "/tasks/bulk", bulk_tasks(context)), "tasks"),
+    ("PUT /tasks/{id}", lambda context: ("PUT", f"/tasks/{context.any_created('tasks')}", {"status": "STARTED"}), None),
+    ("DELETE /tasks/bulk", lambda context: ("DELETE", "/tasks/bulk", context.take_created("tasks", 10)), None),
+    ("DELETE /tasks/{id}", lambda context: ("DELETE", f"/tasks/{context.take_created('tasks')}", None), None),
+    ("DELETE /users/{id}", lambda context: ("DELETE", f"/users/{context.take_created('users')}", None), None),
+    ("DELETE /companies/{id}", lambda context: ("DELETE", f"/companies/{context.take_created('companies')}", None), None),
+]
+
+
+async def request(context: Context, method: str, path: str, body) -> tuple[int, bytes]:
+    headers = dict(context.headers)
+    # Metrics are scraped with their own token instead of a user's
+    if path == "/metrics":
+        headers["authorization"] = f"Bearer {METRICS_TOKEN}"
+    if isinstance(body, str):
+        headers["content-type"] = "application/x-www-form-urlencoded"
+        return await call(method, path, headers, body.encode())
+    if body is not None:
+        headers["content-type"] = "application/json"
+        return await call(method, path, headers, json.dumps(body).encode())
+    return await call(method, path, headers)
+
+
+def collect_ids(content: bytes) -> list:
+    data = json.loads(content)
+    if isinstance(data, dict) and "items" in data:
+        return [item["id"] for item in data["items"]]
+    return [data["id"]]
+
+
+def percentile(latencies: list, value: float) -> float:
+    # Nearest rank on the sorted latencies
+    return latencies[max(0, math.ceil(value / 100 * len(latencies)) - 1)]
+
+
+async def run_scenario(context: Context, build, created: str | None) -> dict:
+    latencies = []
+    errors = 0
+    remaining = context.args.requests
+    
+    async def client() -> None:
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            try:
+                method, path, body = build(context)
+            except IndexError:
+                # No created record left to update or delete, the creations failed
+                return
+            started = time.perf_counter()
+            status, content = await request(context, method, path, body)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+            elif created is not None:
+                context.created[created].extend(collect_ids(content))
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(context.args.concurrency)])
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def prepare(args) -> Context:
+    if args.token:
+        headers = {"authorization": f"Bearer {args.token}"}
+    else:
+        status, content = await request(Context(args, {}, {}), "POST", "/auth/token", login_form(args))
+        if status != 200:
+            raise SystemExit(f"Cannot log in as {args.username} ({status}), please seed the database with cli.seed")
+        headers = {"authorization": f"Bearer {json.loads(content)['access_token']}"}
+    
+    samples = {}
+    for resource in RESOURCES:
+        status, content = await call("GET", f"/{resource}?size=50&fields=id", headers)
+        samples[resource] = [item["id"] for item in json.loads(content)] if status == 200 else []
+        if not samples[resource]:
+            raise SystemExit(f"No {resource} found, please seed the database with cli.seed")
+    
+    return Context(args, headers, samples)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+    """Print the p95 latency changes against a previous run, count the regressions"""
+    regressions = 0
+    for name, result in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        ratio = result["p95_ms"] / previous["p95_ms"] if previous["p95_ms"] else 1.0
+        regressed = ratio > 1 + tolerance
+        regressions += regressed
+        print(
+            f"{name:<30} p95 {previous['p95_ms']:9.2f} -> {result['p95_ms']:9.2f} ms   {ratio:5.2f}x{'   REGRESSION' if regressed else ''}",
+            file=sys.stderr,
+        )
+    return regressions
+
+
+async def main(args) -> int:
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": {},
+    }
+    
+    # Every request comes from the same address and user, the login rate
+    # limit would answer most of them with a 429 instead of measuring them
+    rate_limit.ip_limiter.backend = rate_limit.username_limiter.backend = rate_limit.NullRateLimit()
+    
+    try:
+        async with app.router.lifespan_context(app):
+            context = await prepare(args)
+            for name, build, created in SCENARIOS:
+                if args.only and not any(pattern in name for pattern in args.only):
+                    continue
+                # Logins are handled by Cognito when the local token endpoint is disabled
+                if name.startswith("POST /auth") and auth.router is None:
+                    continue
+                # The metrics endpoint only exists when a metrics token is set
+                if name == "GET /metrics" and not METRICS_TOKEN:
+                    continue
+                result = await run_scenario(context, build, created)
+                results["scenarios"][name] = result
+                print(
+                    f"{name:<30} {result['requests_per_second']:9.1f} req/s"
+                    f"   p50 {result['p50_ms']:8.2f}   p95 {result['p95_ms']:8.2f}   p99 {result['p99_ms']:8.2f} ms"
+                    f"   errors {result['errors']}",
+                    file=sys.stderr,
+                )
+    finally:
+        await async_engine.dispose()
+    
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            return 1 if compare(results, json.load(baseline), args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="number of requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="number of concurrent clients")
+    parser.add_argument("--username", default=ADMIN_USERNAME, help="admin user to log in as")
+    parser.add_argument("--password", default="seed.password", help="password of the admin user")
+    parser.add_argument("--token", help="bearer token to use instead of logging in, e.g. with Cognito")
+    parser.add_argument("--only", action="append", help="only run the scenarios whose name contains this text, repeatable")
+    parser.add_argument("--output", help="write the results to this JSON file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare the p95 latencies with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative p95 increase reported as a regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
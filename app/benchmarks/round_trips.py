@@ -0,0 +1,156 @@
+"""Update / delete round trip benchmark
+
+Compares the single-statement UPDATE ... RETURNING and DELETE ... RETURNING
+company services with the previous SELECT, modify, commit and refresh
+pattern, and the INSERT ... RETURNING task creation with the previous user
+lookup, insert, commit and refresh, reporting the database round trips and
+latency per request.
+
+Run from the `app` directory against a migrated PostgreSQL database:
+
+    python -m benchmarks.round_trips --count 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete, event, insert, select
+
+from database import AsyncSessionLocal, async_engine
+from entities.company import Company
+from entities.task import Task
+from entities.user import User
+from models.company import UpdateCompanyModel
+from models.task import CreateTaskModel
+from services import company as CompanyService
+from services import task as TaskService
+from services import utils
+
+SEED_NAME = "bench-round-trips"
+
+
+class RoundTrips:
+    """Counts the statements, BEGINs, COMMITs and ROLLBACKs sent to the database"""
+    
+    def __init__(self) -> None:
+        self.count = 0
+        for name in ("before_cursor_execute", "begin", "commit", "rollback"):
+            event.listen(async_engine.sync_engine, name, self.inc)
+    
+    def inc(self, *_) -> None:
+        self.count += 1
+
+
+async def seed(count: int) -> list:
+    values = [
+        {
+            "name": SEED_NAME,
+            "description": "Round trip benchmark",
+            "created_at": utils.get_current_utc_time(),
+            "updated_at": utils.get_current_utc_time(),
+        }
+        for _ in range(count)
+    ]
+    async with AsyncSessionLocal() as db:
+        company_ids = (await db.scalars(insert(Company).returning(Company.id), values)).all()
+        await db.commit()
+    return company_ids
+
+
+async def seed_user(company_id) -> User:
+    async with AsyncSessionLocal() as db:
+        user = User(
+            email=f"{SEED_NAME}@example.com",
+            username=SEED_NAME,
+            first_name="Round",
+            last_name="Trips",
+            hashed_password="-",
+            company_id=company_id,
+            created_at=utils.get_current_utc_time(),
+            updated_at=utils.get_current_utc_time(),
+        )
+        db.add(user)
+        await db.commit()
+    return user.id
+
+
+async def legacy_update(company_id, data: UpdateCompanyModel, db) -> None:
+    company = (await db.scalars(select(Company).filter(Company.id == company_id))).first()
+    CompanyService.apply_update(company, data)
+    await db.commit()
+    await db.refresh(company)
+
+
+async def legacy_delete(company_id, _, db) -> None:
+    company = (await db.scalars(select(Company).filter(Company.id == company_id))).first()
+    await db.delete(company)
+    await db.commit()
+
+
+async def service_update(company_id, data: UpdateCompanyModel, db) -> None:
+    await CompanyService.update_company_by_id(company_id, data, db)
+
+
+async def service_delete(company_id, _, db) -> None:
+    await CompanyService.delete_company_by_id(company_id, db)
+
+
+async def legacy_create(_, data: CreateTaskModel, db) -> None:
+    # The user was loaded in full, password hash included, only to check that it exists
+    (await db.scalars(select(User).filter(User.id == data.user_id))).first()
+    task = Task(**data.model_dump(), created_at=utils.get_current_utc_time(), updated_at=utils.get_current_utc_time())
+    db.add(task)
+    await db.commit()
+    await db.refresh(task)
+
+
+async def service_create(_, data: CreateTaskModel, db) -> None:
+    await TaskService.create_task(data, db)
+
+
+async def run(name: str, operation, company_ids: list, round_trips: RoundTrips, data=None) -> None:
+    data = data or UpdateCompanyModel(rating=3, description="Round trip benchmark, updated")
+    latencies = []
+    started_round_trips = round_trips.count
+    for company_id in company_ids:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await operation(company_id, data, db)
+        latencies.append(time.perf_counter() - started)
+    
+    latencies.sort()
+    print(
+        f"{name:<16} round trips / request: {(round_trips.count - started_round_trips) / len(company_ids):.2f}"
+        f"   p50: {latencies[len(latencies) // 2] * 1000:.2f} ms"
+        f"   p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms"
+    )
+
+
+async def main(args) -> None:
+    company_ids = await seed(args.count)
+    half = len(company_ids) // 2
+    user_id = await seed_user((await seed(1))[0])
+    task = CreateTaskModel(summary=SEED_NAME, description="Round trip benchmark", user_id=user_id)
+    round_trips = RoundTrips()
+    
+    try:
+        await run("legacy create", legacy_create, company_ids, round_trips, task)
+        await run("service create", service_create, company_ids, round_trips, task)
+        await run("legacy update", legacy_update, company_ids, round_trips)
+        await run("service update", service_update, company_ids, round_trips)
+        await run("legacy delete", legacy_delete, company_ids[:half], round_trips)
+        await run("service delete", service_delete, company_ids[half:], round_trips)
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Task).filter(Task.summary == SEED_NAME))
+            await db.execute(delete(User).filter(User.username == SEED_NAME))
+            await db.execute(delete(Company).filter(Company.name == SEED_NAME))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="number of tasks to create and of companies to update, then delete")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""Text search benchmark
+
+Seeds a large number of tasks and compares the query plans and latencies of
+the task search filters with and without the text search indexes.
+
+Run from the `app` directory against a migrated PostgreSQL database:
+
+    python -m benchmarks.search --seed 1000000
+    python -m benchmarks.search --cleanup
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, text
+
+from database import async_engine
+from entities.task import Task
+from models.search import SearchMode
+from services import utils
+
+SEED_PREFIX = "bench-search"
+SEARCH_INDEXES = [
+    "ix_tasks_summary_pattern",
+    "ix_tasks_description_pattern",
+    "ix_tasks_summary_trgm",
+    "ix_tasks_description_trgm",
+]
+CASES = [
+    ("summary prefix", Task.summary, f"{SEED_PREFIX} 4f2a", SearchMode.PREFIX),
+    ("description prefix", Task.description, "4f2a", SearchMode.PREFIX),
+    ("summary contains", Task.summary, "c0ffe", SearchMode.CONTAINS),
+    ("description contains", Task.description, "c0ffe", SearchMode.CONTAINS),
+]
+
+
+async def seed(count: int) -> None:
+    async with async_engine.begin() as conn:
+        user_id = (await conn.execute(text("SELECT id FROM users LIMIT 1"))).scalar()
+        if user_id is None:
+            raise SystemExit("No user found, please run the migrations first")
+        
+        await conn.execute(text(
+            """
+            INSERT INTO tasks (id, summary, description, status, priority, user_id, created_at, updated_at)
+            SELECT gen_random_uuid(),
+                   :prefix || ' ' || md5(i::text),
+                   md5((i * 7)::text) || ' ' || md5((i * 13)::text),
+                   'CREATED', i % 6, :user_id,
+                   now() - (i || ' seconds')::interval,
+                   now() - (i || ' seconds')::interval
+            FROM generate_series(1, :count) AS i
+            """
+        ), {"prefix": SEED_PREFIX, "user_id": user_id, "count": count})
+    
+    async with async_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE tasks"))
+
+
+async def cleanup() -> None:
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM tasks WHERE summary LIKE :prefix"), {"prefix": f"{SEED_PREFIX}%"})
+
+
+def compile_query(column, value: str, mode: SearchMode) -> str:
+    query = select(Task).filter(utils.text_filter(column, value, mode))
+    query = query.order_by(Task.created_at, Task.id).limit(10)
+    return str(query.compile(dialect=async_engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+async def explain(conn, sql: str) -> tuple[list[str], float]:
+    started = time.perf_counter()
+    await conn.exec_driver_sql(sql)
+    elapsed = (time.perf_counter() - started) * 1000
+    
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all()
+    return plan, elapsed
+
+
+async def run() -> None:
+    async with async_engine.connect() as conn:
+        for name, column, value, mode in CASES:
+            sql = compile_query(column, value, mode)
+            
+            # Index drops are transactional, so the "before" plan is measured
+            # inside a transaction that is rolled back afterwards.
+            async with conn.begin() as transaction:
+                for index in SEARCH_INDEXES:
+                    await conn.exec_driver_sql(f"DROP INDEX {index}")
+                before_plan, before_ms = await explain(conn, sql)
+                await transaction.rollback()
+            
+            async with conn.begin() as transaction:
+                after_plan, after_ms = await explain(conn, sql)
+                await transaction.rollback()
+            
+            print(f"=== {name} ({mode.value})")
+            print(sql)
+            print(f"--- without indexes: {before_ms:.2f} ms")
+            print("\n".join(before_plan))
+            print(f"--- with indexes: {after_ms:.2f} ms")
+            print("\n".join(after_plan))
+            print()
+
+
+async def main(args) -> None:
+    if args.cleanup:
+        await cleanup()
+        return
+    if args.seed:
+        await seed(args.seed)
+    await run()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="number of tasks to insert before benchmarking")
+    parser.add_argument("--cleanup", action="store_true", help="delete the seeded tasks and exit")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,85 @@
+"""List serialization benchmark
+
+Compares the CPU time spent serializing a page of companies through the
+default FastAPI response path (ORM objects validated one by one with
+from_attributes, jsonable encoding and json.dumps) and through the row tuple
+path of services.serialization (one TypeAdapter validation and orjson, or
+pydantic-core, JSON encoding). No database is needed, the pages are built in
+memory.
+
+Run from the `app` directory:
+
+    python -m benchmarks.serialization --size 50 --iterations 2000
+"""
+
+import argparse
+import asyncio
+from collections import namedtuple
+import time
+import uuid
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from entities.company import Company, CompanyMode
+from models.company import CompanyViewModel
+from services import serialization
+from services import utils
+
+
+def build_page(size: int) -> tuple[list, list]:
+    companies = [
+        Company(
+            id=uuid.uuid4(),
+            name=f"Company {index}",
+            description="Create the best solutions, powered by our excellence in people and technology",
+            mode=CompanyMode.ESTABLISHED,
+            rating=index % 6,
+            created_at=utils.get_current_utc_time(),
+            updated_at=utils.get_current_utc_time(),
+        )
+        for index in range(size)
+    ]
+    # Rows selected with get_view_columns behave like named tuples
+    CompanyRow = namedtuple("CompanyRow", list(CompanyViewModel.model_fields))
+    rows = [CompanyRow(*(getattr(company, name) for name in CompanyViewModel.model_fields)) for company in companies]
+    return companies, rows
+
+
+async def default_path(field, companies: list) -> bytes:
+    content = await serialize_response(field=field, response_content=companies)
+    return JSONResponse(content).body
+
+
+async def row_path(_, rows: list) -> bytes:
+    return serialization.list_response(CompanyViewModel, rows, Response()).body
+
+
+async def measure(name: str, path, field, page: list, iterations: int) -> float:
+    await path(field, page)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await path(field, page)
+    elapsed = (time.perf_counter() - started) / iterations
+
+    print(f"{name:<14} {elapsed * 1000000:9.1f} us / page")
+    return elapsed
+
+
+async def main(args) -> None:
+    companies, rows = build_page(args.size)
+    field = create_response_field(name="Response_get_all_companies", type_=list[CompanyViewModel])
+
+    default = await measure("default path", default_path, field, companies, args.iterations)
+    fast = await measure("row path", row_path, field, rows, args.iterations)
+    print(f"speedup        {default / fast:9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50, help="number of companies per page")
+    parser.add_argument("--iterations", type=int, default=2000, help="number of pages serialized per path")
+    asyncio.run(main(parser.parse_args()))
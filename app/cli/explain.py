@@ -0,0 +1,178 @@
+"""Query plan advisor
+
+Runs the read queries issued by the service functions, and the lookups behind
+the foreign key checks of deletes, against a seeded database. Each statement
+is then EXPLAINed and the ones whose plan scans a whole table are reported:
+they are the filters and foreign keys still missing an index. The exit status
+is 1 when at least one such statement is found, so the advisor can gate a CI
+job.
+
+Tables smaller than --min-rows are ignored, the planner rightly prefers a
+sequential scan on them whatever the indexes. Run from the `app` directory:
+
+    python -m cli.explain
+    python -m cli.explain --min-rows 10000 --verbose
+"""
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+import json
+import sys
+from uuid import uuid4
+
+from sqlalchemy import event, func, literal, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, async_engine, metadata
+from entities.company import Company, CompanyMode
+from entities.task import Task, TaskStatus
+from entities.user import User
+from models.company import SearchCompanyModel
+from models.task import SearchTaskModel
+from models.user import SearchUserModel
+from services import company as CompanyService
+from services import stats as StatsService
+from services import task as TaskService
+from services import user as UserService
+from services import utils
+
+
+def companies(**conds) -> SearchCompanyModel:
+    return SearchCompanyModel(**{"name": None, "description": None, "mode": None, "rating": 0, "page": 1, "size": 10, **conds})
+
+
+def users(**conds) -> SearchUserModel:
+    return SearchUserModel(**{
+        "email": None, "username": None, "first_name": None, "last_name": None,
+        "is_active": None, "is_admin": None, "page": 1, "size": 10, **conds,
+    })
+
+
+def tasks(**conds) -> SearchTaskModel:
+    return SearchTaskModel(**{"summary": None, "description": None, "status": None, "priority": 0, "page": 1, "size": 10, **conds})
+
+
+def cursor(item) -> str:
+    return utils.encode_cursor(item.created_at, item.id)
+
+
+# (name, coroutine issuing the queries) pairs, `sample` holds one row of each table
+CASES = [
+    ("companies", lambda db, sample: CompanyService.get_all_companies_rows(companies(), db)),
+    ("companies after cursor", lambda db, sample: CompanyService.get_all_companies_rows(companies(cursor=cursor(sample[Company])), db)),
+    ("companies by mode", lambda db, sample: CompanyService.get_all_companies_rows(companies(mode=CompanyMode.ESTABLISHED), db)),
+    ("companies by rating", lambda db, sample: CompanyService.get_all_companies_rows(companies(rating=5), db)),
+    ("companies with users.tasks", lambda db, sample: CompanyService.get_all_companies(companies(), db, {"users", "users.tasks"})),
+    ("company by id", lambda db, sample: CompanyService.get_company_entity_by_id(sample[Company].id, db)),
+    ("company stats", lambda db, sample: StatsService.get_company_stats(sample[Company].id, db)),
+    ("users", lambda db, sample: UserService.get_all_users_rows(users(), db)),
+    ("users after cursor", lambda db, sample: UserService.get_all_users_rows(users(cursor=cursor(sample[User])), db)),
+    ("active users", lambda db, sample: UserService.get_all_users_rows(users(is_active=True), db)),
+    ("users with company,tasks", lambda db, sample: UserService.get_all_users(users(), db, {"company", "tasks"})),
+    ("user by id", lambda db, sample: UserService.get_user_entity_by_id(sample[User].id, db)),
+    ("taken usernames", lambda db, sample: UserService.get_taken_usernames({sample[User].username}, db)),
+    ("tasks", lambda db, sample: TaskService.get_all_tasks_rows(tasks(), db)),
+    ("tasks after cursor", lambda db, sample: TaskService.get_all_tasks_rows(tasks(cursor=cursor(sample[Task])), db)),
+    ("tasks by status", lambda db, sample: TaskService.get_all_tasks_rows(tasks(status=TaskStatus.STARTED), db)),
+    ("tasks by priority", lambda db, sample: TaskService.get_all_tasks_rows(tasks(priority=5), db)),
+    ("tasks with user.company", lambda db, sample: TaskService.get_all_tasks(tasks(), db, {"user", "user.company"})),
+    ("task by id", lambda db, sample: TaskService.get_task_entity_by_id(sample[Task].id, db)),
+]
+
+
+@contextmanager
+def capture(statements: list, name: str):
+    """Record the statements sent to the database, with their parameters, under `name`"""
+    count = 0
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+        statements.append((f"{name} #{count}", statement, parameters))
+    
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def collect(db: AsyncSession) -> list:
+    sample = {}
+    for entity in (Company, User, Task):
+        sample[entity] = (await db.scalars(select(entity).limit(1))).first()
+        if sample[entity] is None:
+            raise SystemExit(f"No row found in {entity.__tablename__}, please seed the database first")
+    
+    statements = []
+    for name, run in CASES:
+        with capture(statements, name):
+            await run(db, sample)
+    
+    # Deleting a referenced row looks the referencing rows up, one lookup per foreign key
+    for referencing in metadata.sorted_tables:
+        for foreign_key in referencing.foreign_keys:
+            with capture(statements, f"{referencing.name} by {foreign_key.parent.name}"):
+                await db.execute(select(literal(1)).select_from(referencing).filter(foreign_key.parent == uuid4()))
+    
+    return statements
+
+
+def walk_postgresql(plan: dict):
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from walk_postgresql(child)
+
+
+async def scanned_tables(db: AsyncSession, statement: str, parameters) -> tuple[list[str], list[str]]:
+    """Tables read in full by the plan of the statement, and the plan itself"""
+    conn = await db.connection()
+    
+    if conn.dialect.name == "postgresql":
+        value = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+        plan = (json.loads(value) if isinstance(value, str) else value)[0]["Plan"]
+        lines = (await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)).scalars().all()
+        return list(walk_postgresql(plan)), lines
+    
+    # SQLite reports a full table scan as "SCAN <table>", without "USING ... INDEX"
+    rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+    lines = [row[-1] for row in rows]
+    return [line.split()[1] for line in lines if line.startswith("SCAN ") and "INDEX" not in line], lines
+
+
+async def run(args) -> int:
+    async with AsyncSessionLocal() as db:
+        statements = await collect(db)
+        
+        row_counts = {}
+        flagged = 0
+        for name, statement, parameters in statements:
+            tables, plan = await scanned_tables(db, statement, parameters)
+            
+            for relation in set(tables) - set(row_counts):
+                row_counts[relation] = (await db.execute(select(func.count()).select_from(table(relation)))).scalar()
+            scans = [f"{relation} ({row_counts[relation]} rows)" for relation in dict.fromkeys(tables) if row_counts[relation] >= args.min_rows]
+            
+            if scans:
+                flagged += 1
+                print(f"SEQ SCAN  {name}: {', '.join(scans)}")
+            elif args.verbose:
+                print(f"ok        {name}")
+            if scans or args.verbose:
+                print(f"          {' '.join(statement.split())}")
+                print("\n".join(f"          {line}" for line in plan))
+        
+        await db.rollback()
+    
+    await async_engine.dispose()
+    print(f"{flagged} of {len(statements)} statements scan a table of {args.min_rows} rows or more")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignore sequential scans of smaller tables")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every statement, not only the flagged ones")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,230 @@
+"""Synthetic data generator
+
+Fills the database with companies, users and tasks at production scale. The
+values follow skewed, realistic distributions: a few large companies and
+many small ones, a few users owning most of the tasks, mostly established
+companies, mostly completed tasks, and creation times spread over the last
+--days days. Rows are generated in chunks and streamed with COPY on
+PostgreSQL (multi-row INSERT elsewhere). bcrypt runs once, for the password
+shared by every seeded user.
+
+The first user is the active admin `seed.admin`, so the load benchmark can
+log in with the shared password. Run from the `app` directory against a
+migrated database:
+
+    python -m cli.seed --companies 1000 --users 100000 --tasks 1000000
+    python -m cli.seed --truncate --companies 10 --users 100 --tasks 1000 --random-seed 42
+"""
+
+import argparse
+import asyncio
+from datetime import timedelta
+import enum
+import itertools
+import random
+import time
+import uuid
+
+from sqlalchemy import insert, text
+
+from database import async_engine
+from entities.company import Company, CompanyMode
+from entities.job import Job
+from entities.refresh_token import RefreshToken
+from entities.task import Task, TaskStatus
+from entities.user import User, get_password_hash
+from services import utils
+from services.stats import stats_refresher
+
+ADMIN_USERNAME = "seed.admin"
+CHUNK_SIZE = 10000
+
+FIRST_NAMES = [
+    "Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Heidi", "Ivan", "Judy", "Karl", "Laura",
+    "Mallory", "Niaj", "Olivia", "Peggy", "Quentin", "Rupert", "Sybil", "Trent", "Uma", "Victor", "Wendy", "Yusuf",
+]
+LAST_NAMES = [
+    "Johnson", "Smith", "Williams", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor", "Anderson",
+    "Thomas", "Jackson", "White", "Harris", "Martin", "Garcia", "Martinez", "Robinson", "Clark", "Nguyen",
+]
+COMPANY_WORDS = ["Tech", "Green", "Fin", "Data", "Cloud", "Bright", "Blue", "Nova", "Smart", "Prime", "Quantum", "Urban"]
+COMPANY_SUFFIXES = ["Corp", "Solutions", "Labs", "Systems", "Works", "Group", "Partners", "Industries"]
+TASK_VERBS = ["Review", "Implement", "Fix", "Design", "Document", "Deploy", "Test", "Refactor", "Plan", "Migrate"]
+TASK_NOUNS = [
+    "login page", "billing report", "search index", "onboarding flow", "API gateway", "mobile app",
+    "data pipeline", "audit log", "dashboard", "release notes", "backup job", "pricing model",
+]
+
+MODES = {CompanyMode.ESTABLISHED: 50, CompanyMode.STARTUP: 30, CompanyMode.PENDING: 15, CompanyMode.CLOSED: 5}
+RATINGS = {0: 2, 1: 5, 2: 13, 3: 30, 4: 35, 5: 15}
+STATUSES = {
+    TaskStatus.COMPLETED: 45, TaskStatus.STARTED: 20, TaskStatus.CREATED: 20,
+    TaskStatus.CANCELLED: 10, TaskStatus.BLOCKED: 5,
+}
+PRIORITIES = {0: 10, 1: 25, 2: 30, 3: 20, 4: 10, 5: 5}
+
+
+def choose(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def pareto_weights(rng: random.Random, count: int) -> list:
+    """Cumulative weights skewed so that about 20% of the parents own 80% of the children"""
+    return list(itertools.accumulate(rng.paretovariate(1.16) for _ in range(count)))
+
+
+def random_uuid(rng: random.Random) -> uuid.UUID:
+    # Drawn from the generator rather than uuid4, so that --random-seed repeats the IDs too
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def created_between(rng: random.Random, start, end):
+    return start + (end - start) * rng.random()
+
+
+def generate_companies(rng: random.Random, count: int, since, now) -> list:
+    companies = []
+    for index in range(count):
+        name = f"{rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_SUFFIXES)}"
+        created_at = created_between(rng, since, now)
+        companies.append({
+            "id": random_uuid(rng),
+            "name": f"{name} {index}",
+            "domain": f"{name.lower()}{index}.example.com",
+            "description": f"{rng.choice(COMPANY_WORDS)} {rng.choice(TASK_NOUNS)} provider",
+            "mode": choose(rng, MODES),
+            "rating": choose(rng, RATINGS),
+            "created_at": created_at,
+            "updated_at": created_between(rng, created_at, now),
+        })
+    return companies
+
+
+def generate_users(rng: random.Random, companies: list, count: int, hashed_password: str, now):
+    weights = pareto_weights(rng, len(companies))
+    for index in range(count):
+        company = rng.choices(companies, cum_weights=weights)[0]
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        username = ADMIN_USERNAME if index == 0 else f"{first_name}.{last_name}{index}".lower()
+        created_at = created_between(rng, company["created_at"], now)
+        yield {
+            "id": random_uuid(rng),
+            "email": f"{username}@{company['domain']}",
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "hashed_password": hashed_password,
+            "is_active": index == 0 or rng.random() < 0.9,
+            "is_admin": index == 0 or rng.random() < 0.05,
+            "company_id": company["id"],
+            "created_at": created_at,
+            "updated_at": created_between(rng, created_at, now),
+        }
+
+
+def generate_tasks(rng: random.Random, users: list, count: int, now):
+    weights = pareto_weights(rng, len(users))
+    for _ in range(count):
+        user_id, user_created_at = rng.choices(users, cum_weights=weights)[0]
+        created_at = created_between(rng, user_created_at, now)
+        yield {
+            "id": random_uuid(rng),
+            "summary": f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_NOUNS)}",
+            "description": f"{rng.choice(TASK_VERBS)} the {rng.choice(TASK_NOUNS)} for the {rng.choice(TASK_NOUNS)}",
+            "status": choose(rng, STATUSES),
+            "priority": choose(rng, PRIORITIES),
+            "user_id": user_id,
+            "created_at": created_at,
+            "updated_at": created_between(rng, created_at, now),
+        }
+
+
+def keep_keys(rows, keys: list):
+    for row in rows:
+        keys.append((row["id"], row["created_at"]))
+        yield row
+
+
+def to_record(row: dict, columns: list) -> tuple:
+    # COPY expects the enum names, as stored by the Enum columns
+    return tuple(row[column].name if isinstance(row[column], enum.Enum) else row[column] for column in columns)
+
+
+async def copy(conn, entity, rows) -> int:
+    """Stream the rows to the entity table in chunks, with COPY on PostgreSQL
+    
+    Only the table columns of the rows are written, extra keys are ignored.
+    """
+    table = entity.__table__
+    columns = [column.name for column in table.columns]
+    copied = 0
+    
+    for chunk in iter(lambda: list(itertools.islice(rows, CHUNK_SIZE)), []):
+        if conn.dialect.name == "postgresql":
+            driver_connection = (await conn.get_raw_connection()).driver_connection
+            await driver_connection.copy_records_to_table(table.name, records=[to_record(row, columns) for row in chunk], columns=columns)
+        else:
+            await conn.execute(insert(table), [{column: row[column] for column in columns} for row in chunk])
+        copied += len(chunk)
+    
+    return copied
+
+
+async def seed(args) -> None:
+    rng = random.Random(args.random_seed)
+    now = utils.get_current_utc_time()
+    since = now - timedelta(days=args.days)
+    hashed_password = get_password_hash(args.password)
+    started = time.perf_counter()
+    
+    async with async_engine.begin() as conn:
+        if args.truncate:
+            if conn.dialect.name == "postgresql":
+                # Tables referencing users must be truncated along with it, and
+                # the pending jobs would point to users that no longer exist
+                await conn.execute(text("TRUNCATE jobs, refresh_tokens, tasks, users, companies"))
+            else:
+                for entity in (Job, RefreshToken, Task, User, Company):
+                    await conn.execute(entity.__table__.delete())
+        
+        companies = generate_companies(rng, args.companies, since, now)
+        await copy(conn, Company, iter(companies))
+        print(f"companies: {len(companies)}")
+        
+        # Tasks only need the ID and creation time of their users, not the full rows
+        users = []
+        count = await copy(conn, User, keep_keys(generate_users(rng, companies, args.users, hashed_password, now), users))
+        print(f"users: {count}")
+        
+        count = await copy(conn, Task, generate_tasks(rng, users, args.tasks, now))
+        print(f"tasks: {count}")
+    
+    if async_engine.dialect.name == "postgresql":
+        async with async_engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("ANALYZE companies, users, tasks"))
+        await stats_refresher.refresh()
+    
+    print(f"seeded in {time.perf_counter() - started:.1f} s, log in as {ADMIN_USERNAME} / {args.password}")
+
+
+async def main(args) -> None:
+    try:
+        await seed(args)
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=100, help="number of companies to generate")
+    parser.add_argument("--users", type=int, default=10000, help="number of users to generate, at least 1")
+    parser.add_argument("--tasks", type=int, default=100000, help="number of tasks to generate")
+    parser.add_argument("--days", type=int, default=365, help="creation times are spread over that many past days")
+    parser.add_argument("--password", default="seed.password", help="password shared by every generated user")
+    parser.add_argument("--random-seed", type=int, default=None, help="seed of the value generator, for repeatable data sets")
+    parser.add_argument("--truncate", action="store_true", help="delete every company, user, task, refresh token and background job first")
+    args = parser.parse_args()
+    if args.companies < 1 or args.users < 1:
+        parser.error("at least one company and one user are needed")
+    asyncio.run(main(args))
@@ -1,9 +1,13 @@
+from itertools import cycle
+from uuid import uuid4
+
 from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
-from settings import SQLALCHEMY_DATABASE_URL, SQLALCHEMY_DATABASE_URL_ASYNC
+from settings import DATABASE_POOL, SQLALCHEMY_DATABASE_URL, SQLALCHEMY_DATABASE_URL_ASYNC, SQLALCHEMY_DATABASE_REPLICA_URLS_ASYNC
 
 
 def get_db_context():
@@ -17,11 +21,72 @@ async def get_async_db_context():
     async with AsyncSessionLocal() as async_db:
         yield async_db
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL_ASYNC)
+async def get_async_read_db_context():
+    """Session for read-only endpoints, its queries are served by a read replica when one is configured"""
+    async with AsyncSessionLocal(info={"replica": True}) as async_db:
+        yield async_db
+
+def get_pool_options() -> dict:
+    return {
+        "pool_size": DATABASE_POOL["SIZE"],
+        "max_overflow": DATABASE_POOL["MAX_OVERFLOW"],
+        "pool_timeout": DATABASE_POOL["TIMEOUT"],
+        "pool_recycle": DATABASE_POOL["RECYCLE"],
+        "pool_pre_ping": DATABASE_POOL["PRE_PING"],
+    }
+
+def get_async_connect_args() -> dict:
+    if not DATABASE_POOL["PGBOUNCER"]:
+        return {}
+    # PgBouncer in transaction mode may run each transaction on a different
+    # server connection, so asyncpg must neither cache prepared statements nor
+    # reuse their names across connections.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+# The application only talks to the database through the async engine, the
+# sync engine (and its own connection pool) is opt-in for scripts and tools.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=QueuePool, **get_pool_options()) if DATABASE_POOL["SYNC_ENGINE_ENABLED"] else None
+def create_async_database_engine(url: str):
+    return create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        connect_args=get_async_connect_args(),
+        **get_pool_options()
+    )
+
+async_engine = create_async_database_engine(SQLALCHEMY_DATABASE_URL_ASYNC)
+replica_engines = [create_async_database_engine(url) for url in SQLALCHEMY_DATABASE_REPLICA_URLS_ASYNC]
+replica_cycle = cycle(replica_engines)
+
+class RoutingSession(Session):
+    """Session sending the reads of replica sessions to a read replica
+
+    A session opened with info={"replica": True} picks one replica in a
+    round-robin fashion and keeps using it, so its reads see a consistent
+    snapshot. As soon as the session flushes or executes an INSERT, UPDATE or
+    DELETE it is pinned to the primary, so the reads following a write in the
+    same request never observe replication lag.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["primary"] = True
+        if not replica_engines or not self.info.get("replica") or self.info.get("primary"):
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        if "replica_engine" not in self.info:
+            self.info["replica_engine"] = next(replica_cycle)
+        return self.info["replica_engine"].sync_engine
+
+def is_replica_read(db) -> bool:
+    """Whether the next reads of the session go to a read replica, which may lag behind the primary"""
+    return bool(replica_engines) and bool(db.info.get("replica")) and not db.info.get("primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-AsyncSessionLocal = async_sessionmaker(async_engine, autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False)
 
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
\ No newline at end of file
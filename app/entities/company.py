@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import Column, Enum, SmallInteger, String
+from sqlalchemy import Column, Enum, Index, SmallInteger, String
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -15,6 +15,15 @@ class CompanyMode(enum.Enum):
 
 class Company(BaseEntity, Base):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_created_at_id", "created_at", "id"),
+        Index("ix_companies_name_pattern", "name", postgresql_ops={"name": "text_pattern_ops"}),
+        Index("ix_companies_description_pattern", "description", postgresql_ops={"description": "text_pattern_ops"}),
+        Index("ix_companies_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_companies_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        Index("ix_companies_mode_created_at_id", "mode", "created_at", "id"),
+        Index("ix_companies_rating", "rating"),
+    )
     
     name = Column(String)
     description = Column(String)
@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, column, DateTime, table, Uuid
+
+# The company_stats materialized view is created by a migration and refreshed
+# by services.stats. It is a lightweight table construct rather than a mapped
+# entity, so that it never becomes part of Base.metadata.
+company_stats = table(
+    "company_stats",
+    column("company_id", Uuid),
+    column("user_count", BigInteger),
+    column("active_user_count", BigInteger),
+    column("admin_count", BigInteger),
+    column("task_count", BigInteger),
+    column("created_task_count", BigInteger),
+    column("started_task_count", BigInteger),
+    column("blocked_task_count", BigInteger),
+    column("completed_task_count", BigInteger),
+    column("cancelled_task_count", BigInteger),
+    column("priority_sum", BigInteger),
+    column("refreshed_at", DateTime),
+)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, text
+
+from database import Base
+from entities.base_entity import BaseEntity
+
+class Job(BaseEntity, Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers poll the due jobs that have not failed for good
+        Index("ix_jobs_pending_run_at", "run_at", postgresql_where=text("failed_at IS NULL")),
+    )
+    
+    name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False)
+    last_error = Column(String, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String, Uuid
+
+from database import Base
+from entities.base_entity import BaseEntity
+
+class RefreshToken(BaseEntity, Base):
+    __tablename__ = "refresh_tokens"
+    
+    # HMAC-SHA256 of the token, the token itself is never stored
+    token_hash = Column(String, unique=True, nullable=False, index=True)
+    # Tokens issued by rotation share the family of the login that started the session
+    family_id = Column(Uuid, nullable=False, index=True)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
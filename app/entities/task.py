@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import Column, Enum, ForeignKey, SmallInteger, String, Uuid
+from sqlalchemy import Column, Enum, ForeignKey, Index, SmallInteger, String, text, Uuid
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -15,6 +15,18 @@ class TaskStatus(enum.Enum):
 
 class Task(BaseEntity, Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_summary_pattern", "summary", postgresql_ops={"summary": "text_pattern_ops"}),
+        Index("ix_tasks_description_pattern", "description", postgresql_ops={"description": "text_pattern_ops"}),
+        Index("ix_tasks_summary_trgm", "summary", postgresql_using="gin", postgresql_ops={"summary": "gin_trgm_ops"}),
+        Index("ix_tasks_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        Index("ix_tasks_user_id", "user_id"),
+        Index("ix_tasks_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_tasks_priority", "priority"),
+        # Listings of the tasks still in progress, much smaller than the full history
+        Index("ix_tasks_open_created_at_id", "created_at", "id", postgresql_where=text("status IN ('CREATED', 'STARTED', 'BLOCKED')")),
+    )
     
     summary = Column(String)
     description = Column(String)
@@ -1,5 +1,8 @@
-from sqlalchemy import Boolean, Column, ForeignKey, String, Uuid
-from sqlalchemy.orm import relationship
+import secrets
+from typing import Optional
+
+from sqlalchemy import Boolean, Column, ForeignKey, Index, String, text, Uuid
+from sqlalchemy.orm import deferred, relationship
 from passlib.context import CryptContext
 
 from database import Base
@@ -8,14 +11,36 @@ from entities.task import Task
 
 bcrypt_context = CryptContext(schemes=["bcrypt"])
 
+# Stored until a background job hashes the default password, it never matches a password
+PENDING_PASSWORD_HASH = "!pending"
+
+# Hash of a random password, computed on first use. Verifying against it
+# costs as much as a real verification and never succeeds.
+dummy_hash: Optional[str] = None
+
 class User(BaseEntity, Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_email_pattern", "email", postgresql_ops={"email": "text_pattern_ops"}),
+        Index("ix_users_username_pattern", "username", postgresql_ops={"username": "text_pattern_ops"}),
+        Index("ix_users_first_name_pattern", "first_name", postgresql_ops={"first_name": "text_pattern_ops"}),
+        Index("ix_users_last_name_pattern", "last_name", postgresql_ops={"last_name": "text_pattern_ops"}),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_users_username_trgm", "username", postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"}),
+        Index("ix_users_first_name_trgm", "first_name", postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}),
+        Index("ix_users_last_name_trgm", "last_name", postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}),
+        Index("ix_users_company_id", "company_id"),
+        Index("ix_users_active_created_at_id", "created_at", "id", postgresql_where=text("is_active")),
+        Index("ix_users_pending_password_created_at", "created_at", postgresql_where=text(f"hashed_password = '{PENDING_PASSWORD_HASH}'")),
+    )
     
     email = Column(String, unique=True, nullable=False, index=True)
     username = Column(String, unique=True, nullable=False, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
-    hashed_password = Column(String, nullable=False)
+    # Only loaded on demand, read paths never need it
+    hashed_password = deferred(Column(String, nullable=False))
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     company_id = Column(Uuid, ForeignKey("companies.id"), nullable=False)
@@ -28,5 +53,18 @@ def get_password_hash(password):
     return bcrypt_context.hash(password)
 
 
+def get_dummy_hash():
+    global dummy_hash
+    if dummy_hash is None:
+        dummy_hash = bcrypt_context.hash(secrets.token_urlsafe(16))
+    return dummy_hash
+
+
 def verify_password(plain_password, hashed_password):
+    if hashed_password == PENDING_PASSWORD_HASH:
+        # Cost a full verification anyway, so that accounts still waiting
+        # for their hash, and unknown users, cannot be told apart by the
+        # response time
+        bcrypt_context.verify(plain_password, get_dummy_hash())
+        return False
     return bcrypt_context.verify(plain_password, hashed_password)
\ No newline at end of file
@@ -1,10 +1,53 @@
 """Main Application"""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import secrets
 
-from routers import auth, company, task, user
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-app = FastAPI()
+from database import async_engine, engine, replica_engines
+from routers import auth, company, stats, task, user
+from services import instrumentation
+from services.auth import CognitoAuthorizer, authorizer
+from services.exception import UnAuthorizedError
+from services.jobs import job_queue
+from services.metrics import registry
+from services.password import password_hasher
+from services.refresh_token import refresh_token_purger
+from services.stats import stats_refresher
+from settings import METRICS_TOKEN
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if isinstance(authorizer, CognitoAuthorizer):
+        await authorizer.jwks.start()
+    await stats_refresher.start()
+    if auth.router:
+        await refresh_token_purger.start()
+    await job_queue.start()
+    yield
+    # Jobs are drained first, they may still need the database and the password hashing pool
+    await job_queue.stop()
+    await refresh_token_purger.stop()
+    await stats_refresher.stop()
+    if isinstance(authorizer, CognitoAuthorizer):
+        await authorizer.jwks.stop()
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(instrumentation.MetricsMiddleware)
+
+instrumentation.instrument_engine(async_engine.sync_engine)
+instrumentation.instrument_pool(async_engine.sync_engine, "async")
+for index, replica_engine in enumerate(replica_engines):
+    instrumentation.instrument_engine(replica_engine.sync_engine)
+    instrumentation.instrument_pool(replica_engine.sync_engine, f"replica{index}")
+if engine is not None:
+    instrumentation.instrument_engine(engine)
+    instrumentation.instrument_pool(engine, "sync")
 
 if(auth.router):
     app.include_router(auth.router)
@@ -12,6 +55,7 @@ if(auth.router):
 app.include_router(company.router)
 app.include_router(task.router)
 app.include_router(user.router)
+app.include_router(stats.router)
 
 @app.get("/", tags=["Health Check"])
 async def health_check():
@@ -23,3 +67,22 @@ async def health_check():
 
     """
     return "API Service is up and running!"
+
+metrics_scheme = HTTPBearer(auto_error=False)
+
+def check_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(metrics_scheme)) -> None:
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise UnAuthorizedError()
+
+# Metrics reveal the routes, traffic and database load of the service, they are not public
+if METRICS_TOKEN:
+    @app.get("/metrics", tags=["Metrics"], response_class=PlainTextResponse, dependencies=[Depends(check_metrics_token)])
+    async def metrics():
+        """
+        Endpoint for scraping the service metrics.
+
+        Returns:
+            str: The collected metrics in the Prometheus text exposition format.
+
+        """
+        return registry.render()
@@ -12,4 +12,6 @@ class UserClaims(BaseModel):
     aud: str = None
     iss: str = None
     iat: int
-    exp: int
\ No newline at end of file
+    exp: int
+class RefreshTokenModel(BaseModel):
+    refresh_token: str
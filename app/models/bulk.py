@@ -0,0 +1,16 @@
+from typing import Generic, TypeVar
+from pydantic import BaseModel
+from uuid import UUID
+
+MAX_BULK_SIZE = 1000
+
+T = TypeVar("T")
+
+class BulkItemError(BaseModel):
+    index: int
+    id: UUID | None = None
+    detail: str
+
+class BulkResultModel(BaseModel, Generic[T]):
+    items: list[T] = []
+    errors: list[BulkItemError] = []
\ No newline at end of file
@@ -3,15 +3,18 @@ from pydantic import BaseModel, Field
 from entities.company import CompanyMode
 from datetime import datetime
 from uuid import UUID
+from models.search import SearchMode
 
 class SearchCompanyModel():
-    def __init__(self, name, description, mode, rating, page, size) -> None:
+    def __init__(self, name, description, mode, rating, page, size, cursor=None, search_mode=SearchMode.PREFIX) -> None:
         self.name = name
         self.description = description
         self.mode = mode
         self.rating = rating
         self.page = page
         self.size = size
+        self.cursor = cursor
+        self.search_mode = search_mode
 
 class CreateCompanyModel(BaseModel):
     name: str = Field()
@@ -45,6 +48,9 @@ class UpdateCompanyModel(BaseModel):
             }
         }
 
+class BulkUpdateCompanyModel(UpdateCompanyModel):
+    id: UUID = Field()
+
 class CompanyViewModel(BaseModel):
     id: UUID 
     name: str | None = None
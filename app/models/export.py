@@ -0,0 +1,5 @@
+import enum
+
+class ExportFormat(enum.Enum):
+    NDJSON = "NDJSON"
+    CSV = "CSV"
\ No newline at end of file
@@ -0,0 +1,64 @@
+import enum
+from typing import ClassVar, List, Optional, Set, Type
+
+from pydantic import BaseModel
+
+from models.company import CompanyViewModel
+from models.task import TaskViewModel
+from models.user import UserViewModel
+
+class CompanyInclude(enum.Enum):
+    USERS = "users"
+    TASKS = "users.tasks"
+
+class UserInclude(enum.Enum):
+    COMPANY = "company"
+    TASKS = "tasks"
+
+class TaskInclude(enum.Enum):
+    USER = "user"
+    COMPANY = "user.company"
+
+class CompanyIncludeViewModel(CompanyViewModel):
+    relations: ClassVar[dict] = {}
+
+    users: Optional[List["UserIncludeViewModel"]] = None
+
+class UserIncludeViewModel(UserViewModel):
+    relations: ClassVar[dict] = {}
+
+    company: Optional[CompanyIncludeViewModel] = None
+    tasks: Optional[List["TaskIncludeViewModel"]] = None
+
+class TaskIncludeViewModel(TaskViewModel):
+    relations: ClassVar[dict] = {}
+
+    user: Optional[UserIncludeViewModel] = None
+
+CompanyIncludeViewModel.relations = {"users": UserIncludeViewModel}
+UserIncludeViewModel.relations = {"company": CompanyIncludeViewModel, "tasks": TaskIncludeViewModel}
+TaskIncludeViewModel.relations = {"user": UserIncludeViewModel}
+CompanyIncludeViewModel.model_rebuild()
+UserIncludeViewModel.model_rebuild()
+
+def to_include_view(model: Type[BaseModel], item, include: Set[str], path: str = "") -> BaseModel:
+    """Build the view of an entity, following only the requested relationships
+
+    Relationships that were not requested are left unset, so they are neither
+    lazy loaded nor rendered by endpoints using response_model_exclude_unset.
+    """
+    data = {name: getattr(item, name) for name in model.model_fields if name not in model.relations}
+
+    for name, related_model in model.relations.items():
+        relation_path = f"{path}{name}"
+        if relation_path not in include:
+            continue
+        related = getattr(item, name)
+        if isinstance(related, list):
+            data[name] = [to_include_view(related_model, value, include, f"{relation_path}.") for value in related]
+        elif related is not None:
+            data[name] = to_include_view(related_model, related, include, f"{relation_path}.")
+        else:
+            data[name] = None
+
+    return model.model_validate(data)
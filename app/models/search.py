@@ -0,0 +1,5 @@
+import enum
+
+class SearchMode(enum.Enum):
+    PREFIX = "PREFIX"
+    CONTAINS = "CONTAINS"
\ No newline at end of file
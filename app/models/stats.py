@@ -0,0 +1,20 @@
+from datetime import datetime
+from uuid import UUID
+from pydantic import BaseModel
+from entities.task import TaskStatus
+
+class TaskStatsViewModel(BaseModel):
+    task_count: int
+    tasks_by_status: dict[TaskStatus, int]
+    average_priority: float | None = None
+    refreshed_at: datetime | None = None
+
+class CompanyStatsViewModel(BaseModel):
+    company_id: UUID
+    user_count: int
+    active_user_count: int
+    admin_count: int
+    task_count: int
+    tasks_by_status: dict[TaskStatus, int]
+    average_priority: float | None = None
+    refreshed_at: datetime | None = None
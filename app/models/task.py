@@ -3,15 +3,18 @@ from pydantic import BaseModel, Field
 from entities.task import TaskStatus
 from datetime import datetime
 from uuid import UUID
+from models.search import SearchMode
 
 class SearchTaskModel():
-    def __init__(self, summary, description, status, priority, page, size) -> None:
+    def __init__(self, summary, description, status, priority, page, size, cursor=None, search_mode=SearchMode.PREFIX) -> None:
         self.summary = summary
         self.description = description
         self.status = status
         self.priority = priority
         self.page = page
         self.size = size
+        self.cursor = cursor
+        self.search_mode = search_mode
 
 class CreateTaskModel(BaseModel):
     summary: Optional[str] = None
@@ -47,6 +50,9 @@ class UpdateTaskModel(BaseModel):
             }
         }
 
+class BulkUpdateTaskModel(UpdateTaskModel):
+    id: UUID = Field()
+
 class TaskViewModel(BaseModel):
     id: UUID 
     summary: str | None = None
@@ -2,6 +2,7 @@ from typing import Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
+from models.search import SearchMode
 
 class SearchUserModel():
     def __init__(
@@ -13,7 +14,9 @@ class SearchUserModel():
         is_active,
         is_admin,
         page, 
-        size
+        size,
+        cursor=None,
+        search_mode=SearchMode.PREFIX
     ) -> None:
         self.email = email
         self.username = username
@@ -23,6 +26,8 @@ class SearchUserModel():
         self.is_admin = is_admin
         self.page = page
         self.size = size
+        self.cursor = cursor
+        self.search_mode = search_mode
 
 class CreateUserModel(BaseModel):
     first_name: str = Field()
@@ -56,6 +61,8 @@ class UpdateUserModel(BaseModel):
             }
         }
 
+class BulkUpdateUserModel(UpdateUserModel):
+    id: UUID = Field()
 
 class UserViewModel(BaseModel):
     id: UUID 
@@ -1,32 +1,63 @@
 
 from datetime import timedelta
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
-from database import get_db_context
+from database import get_async_db_context
+from models.auth import RefreshTokenModel
 from services import auth as AuthService
+from services import rate_limit
+from services import refresh_token as RefreshTokenService
 from services.exception import UnAuthorizedError
 from settings import COGNITO
 
 router = None
 
+ACCESS_TOKEN_TTL = int(timedelta(minutes=10).total_seconds())
+
 if not COGNITO["ENABLED"]:
     router = APIRouter(prefix="/auth", tags=["Auth"])
     @router.post("/token")
     async def login_for_access_token(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db_context)
+        db: AsyncSession = Depends(get_async_db_context)
         ):
-            user = AuthService.authenticate_user(form_data.username, form_data.password, db)
+            # Throttled attempts are rejected before any database or bcrypt work
+            await rate_limit.check_login(request.client.host if request.client else None, form_data.username)
+
+            user = await AuthService.authenticate_user(form_data.username, form_data.password, db)
 
             if not user:
                 raise UnAuthorizedError()
 
+            refresh_token = await RefreshTokenService.issue_refresh_token(user.id, db)
+            await db.commit()
+
+            return {
+                "token_type": "bearer",
+                "access_token": AuthService.create_access_token(user, ACCESS_TOKEN_TTL),
+                "refresh_token": refresh_token,
+            }
+
+    @router.post("/refresh")
+    async def refresh_access_token(
+        data: RefreshTokenModel,
+        db: AsyncSession = Depends(get_async_db_context)
+        ):
+            # No password verification, the token is checked with an HMAC and one indexed lookup
+            user, refresh_token = await RefreshTokenService.rotate_refresh_token(data.refresh_token, db)
+
             return {
                 "token_type": "bearer",
-                "access_token":  AuthService.create_access_token(
-                    user, 
-                    int(timedelta(minutes=10).total_seconds())
-                ),
-            }
\ No newline at end of file
+                "access_token": AuthService.create_access_token(user, ACCESS_TOKEN_TTL),
+                "refresh_token": refresh_token,
+            }
+
+    @router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+    async def revoke_refresh_token(
+        data: RefreshTokenModel,
+        db: AsyncSession = Depends(get_async_db_context)
+        ):
+            await RefreshTokenService.revoke_refresh_token(data.refresh_token, db)
\ No newline at end of file
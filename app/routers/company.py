@@ -1,81 +1,209 @@
 from uuid import UUID
+from typing import List
 from starlette import status
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from entities.company import CompanyMode
-from database import get_db_context
+from database import get_async_db_context, get_async_read_db_context
 from models.auth import UserClaims
-from models.company import CreateCompanyModel, CompanyViewModel, UpdateCompanyModel, SearchCompanyModel
+from models.bulk import BulkResultModel, MAX_BULK_SIZE
+from models.company import BulkUpdateCompanyModel, CreateCompanyModel, CompanyViewModel, UpdateCompanyModel, SearchCompanyModel
+from models.export import ExportFormat
+from models.include import CompanyInclude, CompanyIncludeViewModel, to_include_view
+from models.search import SearchMode
+from models.stats import CompanyStatsViewModel
 from services import company as CompanyService
+from services import conditional
+from services import export
+from services import serialization
+from services import stats as StatsService
 from services.auth import authorizer
+from services import utils
 from services.exception import ResourceNotFoundError, AccessDeniedError
 
 router = APIRouter(prefix="/companies", tags=["Companies"])
 
-@router.get("", status_code=status.HTTP_200_OK, response_model=list[CompanyViewModel])
+@router.get("", status_code=status.HTTP_200_OK, response_model=list[CompanyIncludeViewModel])
 async def get_all_companies(
+    request: Request,
+    response: Response,
     name: str = Query(default=None),
     description: str = Query(default=None),
     mode: CompanyMode = Query(default=None),
     rating: int = Query(ge=0, le=5, default=0),
     page: int = Query(ge=1, default=1),
     size: int = Query(ge=1, le=50, default=10),
-    db: Session = Depends(get_db_context),
+    cursor: str = Query(default=None),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    include: str = Query(default=None, description="Comma separated related records to include: users, users.tasks"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,name,rating"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    conds = SearchCompanyModel(name, description, mode, rating, page, size)
-    return CompanyService.get_all_companies(conds, db)
+    conds = SearchCompanyModel(name, description, mode, rating, page, size, cursor, search_mode)
+    include_paths = utils.parse_include(include, CompanyInclude)
+    field_names = utils.parse_fields(fields, CompanyViewModel)
+    if include_paths:
+        companies = await CompanyService.get_all_companies(conds, db, include_paths)
+        views = [to_include_view(CompanyIncludeViewModel, company, include_paths) for company in companies]
+        etag = conditional.list_etag(conditional.view_keys(views))
+    else:
+        # Pages without related records take the faster row tuple serialization path
+        companies = await CompanyService.get_all_companies_rows(conds, db, field_names)
+        etag = conditional.list_etag((company.id, company.updated_at) for company in companies)
+    
+    next_cursor = utils.get_next_cursor(companies, size)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    not_modified = conditional.not_modified_response(request, response, etag, None)
+    if not_modified is not None:
+        return not_modified
+    
+    if include_paths:
+        return serialization.view_response(CompanyIncludeViewModel, views, response, field_names)
+    return serialization.list_response(CompanyViewModel, companies, response, field_names)
+
+@router.get("/export", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_companies(
+    name: str = Query(default=None),
+    description: str = Query(default=None),
+    mode: CompanyMode = Query(default=None),
+    rating: int = Query(ge=0, le=5, default=0),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    format: ExportFormat = Query(default=ExportFormat.NDJSON),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active:
+        raise AccessDeniedError()
+    
+    conds = SearchCompanyModel(name, description, mode, rating, None, None, None, search_mode)
+    return export.export_response(CompanyService.get_export_query(conds), CompanyViewModel, format, "companies")
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[CompanyViewModel])
+async def create_companies(
+    request: List[CreateCompanyModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    companies, errors = await CompanyService.create_companies(request, db)
+    return {"items": companies, "errors": errors}
 
-@router.get("/{company_id}", status_code=status.HTTP_200_OK, response_model=CompanyViewModel)
+@router.put("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[CompanyViewModel])
+async def update_companies(
+    request: List[BulkUpdateCompanyModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    companies, errors = await CompanyService.update_companies(request, db)
+    return {"items": companies, "errors": errors}
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[UUID])
+async def delete_companies(
+    company_ids: List[UUID] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    deleted, errors = await CompanyService.delete_companies(company_ids, db)
+    return {"items": deleted, "errors": errors}
+
+@router.get("/{company_id}", status_code=status.HTTP_200_OK, response_model=CompanyIncludeViewModel)
 async def get_company_by_id(
-    company_id: UUID, 
-    db: Session = Depends(get_db_context),
+    request: Request,
+    response: Response,
+    company_id: UUID,
+    include: str = Query(default=None, description="Comma separated related records to include: users, users.tasks"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,name,rating"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    company = CompanyService.get_company_by_id(company_id, db)
+    include_paths = utils.parse_include(include, CompanyInclude)
+    field_names = utils.parse_fields(fields, CompanyViewModel)
+    company = await CompanyService.get_company_by_id(company_id, db, include_paths)
     
     if company is None:
         raise ResourceNotFoundError()
     
-    return company
+    view = to_include_view(CompanyIncludeViewModel, company, include_paths)
+    
+    # Included rows may change without touching the company, so only the ETag covers them.
+    # Only the full record gets a strong ETag, the one If-Match is compared with.
+    if include_paths or field_names:
+        etag = conditional.list_etag(conditional.view_keys([view]))
+    else:
+        etag = conditional.entity_etag(company.id, company.updated_at)
+    not_modified = conditional.not_modified_response(request, response, etag, company.updated_at if not include_paths else None)
+    if not_modified is not None:
+        return not_modified
+    
+    return serialization.view_response(CompanyIncludeViewModel, view, response, field_names)
+
+@router.get("/{company_id}/stats", status_code=status.HTTP_200_OK, response_model=CompanyStatsViewModel)
+async def get_company_stats(
+    company_id: UUID,
+    db: AsyncSession = Depends(get_async_read_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active:
+        raise AccessDeniedError()
+    
+    if await CompanyService.get_company_by_id(company_id, db) is None:
+        raise ResourceNotFoundError()
+    
+    return await StatsService.get_company_stats(company_id, db)
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=CompanyViewModel)
 async def create_company(
     request: CreateCompanyModel, 
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return CompanyService.create_company(request, db)
+    return await CompanyService.create_company(request, db)
 
 @router.put("/{company_id}", status_code=status.HTTP_200_OK, response_model=CompanyViewModel)
 async def update_company_by_id(
+    response: Response,
     company_id: UUID,
     request: UpdateCompanyModel,
-    db: Session = Depends(get_db_context),
+    if_match: str = Header(default=None),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return CompanyService.update_company_by_id(company_id, request, db)
+    company = await CompanyService.update_company_by_id(company_id, request, db, if_match)
+    
+    conditional.set_validators(response, conditional.entity_etag(company.id, company.updated_at), company.updated_at)
+    return company
 
 @router.delete("/{company_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_company_by_id(
     company_id: UUID, 
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    CompanyService.delete_company_by_id(company_id, db)
\ No newline at end of file
+    await CompanyService.delete_company_by_id(company_id, db)
\ No newline at end of file
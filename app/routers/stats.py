@@ -0,0 +1,22 @@
+from starlette import status
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_read_db_context
+from models.auth import UserClaims
+from models.stats import TaskStatsViewModel
+from services import stats as StatsService
+from services.auth import authorizer
+from services.exception import AccessDeniedError
+
+router = APIRouter(prefix="/stats", tags=["Statistics"])
+
+@router.get("/tasks", status_code=status.HTTP_200_OK, response_model=TaskStatsViewModel)
+async def get_task_stats(
+    db: AsyncSession = Depends(get_async_read_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active:
+        raise AccessDeniedError()
+    
+    return await StatsService.get_task_stats(db)
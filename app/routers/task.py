@@ -1,81 +1,193 @@
 from uuid import UUID
+from typing import List
 from starlette import status
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from entities.task import TaskStatus
-from database import get_db_context
+from database import get_async_db_context, get_async_read_db_context
 from models.auth import UserClaims
-from models.task import CreateTaskModel, TaskViewModel, UpdateTaskModel, SearchTaskModel
+from models.bulk import BulkResultModel, MAX_BULK_SIZE
+from models.task import BulkUpdateTaskModel, CreateTaskModel, TaskViewModel, UpdateTaskModel, SearchTaskModel
+from models.export import ExportFormat
+from models.include import TaskInclude, TaskIncludeViewModel, to_include_view
+from models.search import SearchMode
 from services import task as TaskService
+from services import conditional
+from services import export
+from services import serialization
 from services.auth import authorizer
+from services import utils
 from services.exception import ResourceNotFoundError, AccessDeniedError
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
-@router.get("", status_code=status.HTTP_200_OK, response_model=list[TaskViewModel])
+@router.get("", status_code=status.HTTP_200_OK, response_model=list[TaskIncludeViewModel])
 async def get_all_tasks(
+    request: Request,
+    response: Response,
     summary: str = Query(default=None),
     description: str = Query(default=None),
     status: TaskStatus = Query(default=None),
     priority: int = Query(ge=0, le=5, default=0),
     page: int = Query(ge=1, default=1),
     size: int = Query(ge=1, le=50, default=10),
-    db: Session = Depends(get_db_context),
+    cursor: str = Query(default=None),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    include: str = Query(default=None, description="Comma separated related records to include: user, user.company"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,summary,status"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    conds = SearchTaskModel(summary, description, status, priority, page, size)
-    return TaskService.get_all_tasks(conds, db)
+    conds = SearchTaskModel(summary, description, status, priority, page, size, cursor, search_mode)
+    include_paths = utils.parse_include(include, TaskInclude)
+    field_names = utils.parse_fields(fields, TaskViewModel)
+    if include_paths:
+        tasks = await TaskService.get_all_tasks(conds, db, include_paths)
+        views = [to_include_view(TaskIncludeViewModel, task, include_paths) for task in tasks]
+        etag = conditional.list_etag(conditional.view_keys(views))
+    else:
+        # Pages without related records take the faster row tuple serialization path
+        tasks = await TaskService.get_all_tasks_rows(conds, db, field_names)
+        etag = conditional.list_etag((task.id, task.updated_at) for task in tasks)
+    
+    next_cursor = utils.get_next_cursor(tasks, size)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    not_modified = conditional.not_modified_response(request, response, etag, None)
+    if not_modified is not None:
+        return not_modified
+    
+    if include_paths:
+        return serialization.view_response(TaskIncludeViewModel, views, response, field_names)
+    return serialization.list_response(TaskViewModel, tasks, response, field_names)
+
+@router.get("/export", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_tasks(
+    summary: str = Query(default=None),
+    description: str = Query(default=None),
+    status: TaskStatus = Query(default=None),
+    priority: int = Query(ge=0, le=5, default=0),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    format: ExportFormat = Query(default=ExportFormat.NDJSON),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active:
+        raise AccessDeniedError()
+    
+    conds = SearchTaskModel(summary, description, status, priority, None, None, None, search_mode)
+    return export.export_response(TaskService.get_export_query(conds), TaskViewModel, format, "tasks")
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[TaskViewModel])
+async def create_tasks(
+    request: List[CreateTaskModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    tasks, errors = await TaskService.create_tasks(request, db)
+    return {"items": tasks, "errors": errors}
 
-@router.get("/{task_id}", status_code=status.HTTP_200_OK, response_model=TaskViewModel)
+@router.put("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[TaskViewModel])
+async def update_tasks(
+    request: List[BulkUpdateTaskModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    tasks, errors = await TaskService.update_tasks(request, db)
+    return {"items": tasks, "errors": errors}
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[UUID])
+async def delete_tasks(
+    task_ids: List[UUID] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    deleted, errors = await TaskService.delete_tasks(task_ids, db)
+    return {"items": deleted, "errors": errors}
+
+@router.get("/{task_id}", status_code=status.HTTP_200_OK, response_model=TaskIncludeViewModel)
 async def get_task_by_id(
-    task_id: UUID, 
-    db: Session = Depends(get_db_context),
+    request: Request,
+    response: Response,
+    task_id: UUID,
+    include: str = Query(default=None, description="Comma separated related records to include: user, user.company"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,summary,status"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    task = TaskService.get_task_by_id(task_id, db)
+    include_paths = utils.parse_include(include, TaskInclude)
+    field_names = utils.parse_fields(fields, TaskViewModel)
+    task = await TaskService.get_task_by_id(task_id, db, include_paths)
     
     if task is None:
         raise ResourceNotFoundError()
     
-    return task
+    view = to_include_view(TaskIncludeViewModel, task, include_paths)
+    
+    # Included rows may change without touching the task, so only the ETag covers them.
+    # Only the full record gets a strong ETag, the one If-Match is compared with.
+    if include_paths or field_names:
+        etag = conditional.list_etag(conditional.view_keys([view]))
+    else:
+        etag = conditional.entity_etag(task.id, task.updated_at)
+    not_modified = conditional.not_modified_response(request, response, etag, task.updated_at if not include_paths else None)
+    if not_modified is not None:
+        return not_modified
+    
+    return serialization.view_response(TaskIncludeViewModel, view, response, field_names)
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=TaskViewModel)
 async def create_task(
     request: CreateTaskModel,
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return TaskService.create_task(request, db)
+    return await TaskService.create_task(request, db)
 
 @router.put("/{task_id}", status_code=status.HTTP_200_OK, response_model=TaskViewModel)
 async def update_task_by_id(
+    response: Response,
     task_id: UUID,
     request: UpdateTaskModel,
-    db: Session = Depends(get_db_context),
+    if_match: str = Header(default=None),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return TaskService.update_task_by_id(task_id, request, db)
+    task = await TaskService.update_task_by_id(task_id, request, db, if_match)
+    
+    conditional.set_validators(response, conditional.entity_etag(task.id, task.updated_at), task.updated_at)
+    return task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task_by_id(
     task_id: UUID, 
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    TaskService.delete_task_by_id(task_id, db)
\ No newline at end of file
+    await TaskService.delete_task_by_id(task_id, db)
\ No newline at end of file
@@ -1,19 +1,31 @@
 from uuid import UUID
+from typing import List
 from starlette import status
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db_context
-from models.user import CreateUserModel, UserViewModel, UpdateUserModel, SearchUserModel
+from database import get_async_db_context, get_async_read_db_context
+from models.bulk import BulkResultModel, MAX_BULK_SIZE
+from models.user import BulkUpdateUserModel, CreateUserModel, UserViewModel, UpdateUserModel, SearchUserModel
+from models.export import ExportFormat
+from models.include import UserInclude, UserIncludeViewModel, to_include_view
+from models.search import SearchMode
 from models.auth import UserClaims
 from services import user as UserService
+from services import conditional
+from services import export
+from services import serialization
 from services.auth import authorizer
+from services import utils
 from services.exception import ResourceNotFoundError, AccessDeniedError
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.get("", status_code=status.HTTP_200_OK, response_model=list[UserViewModel])
+@router.get("", status_code=status.HTTP_200_OK, response_model=list[UserIncludeViewModel])
 async def get_all_users(
+    request: Request,
+    response: Response,
     email: str = Query(default=None),
     username: str = Query(default=None),
     first_name: str = Query(default=None),
@@ -22,61 +34,163 @@ async def get_all_users(
     is_admin: bool = Query(default=None),
     page: int = Query(ge=1, default=1),
     size: int = Query(ge=1, le=50, default=10),
-    db: Session = Depends(get_db_context),
+    cursor: str = Query(default=None),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    include: str = Query(default=None, description="Comma separated related records to include: company, tasks"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,username,email"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    conds = SearchUserModel(email, username, first_name, last_name, is_active, is_admin, page, size)
-    return UserService.get_all_users(conds, db)
+    conds = SearchUserModel(email, username, first_name, last_name, is_active, is_admin, page, size, cursor, search_mode)
+    include_paths = utils.parse_include(include, UserInclude)
+    field_names = utils.parse_fields(fields, UserViewModel)
+    if include_paths:
+        users = await UserService.get_all_users(conds, db, include_paths)
+        views = [to_include_view(UserIncludeViewModel, user, include_paths) for user in users]
+        etag = conditional.list_etag(conditional.view_keys(views))
+    else:
+        # Pages without related records take the faster row tuple serialization path
+        users = await UserService.get_all_users_rows(conds, db, field_names)
+        etag = conditional.list_etag((user.id, user.updated_at) for user in users)
+    
+    next_cursor = utils.get_next_cursor(users, size)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    not_modified = conditional.not_modified_response(request, response, etag, None)
+    if not_modified is not None:
+        return not_modified
+    
+    if include_paths:
+        return serialization.view_response(UserIncludeViewModel, views, response, field_names)
+    return serialization.list_response(UserViewModel, users, response, field_names)
+
+@router.get("/export", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_users(
+    email: str = Query(default=None),
+    username: str = Query(default=None),
+    first_name: str = Query(default=None),
+    last_name: str = Query(default=None),
+    is_active: bool = Query(default=None),
+    is_admin: bool = Query(default=None),
+    search_mode: SearchMode = Query(default=SearchMode.PREFIX),
+    format: ExportFormat = Query(default=ExportFormat.NDJSON),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active:
+        raise AccessDeniedError()
+    
+    conds = SearchUserModel(email, username, first_name, last_name, is_active, is_admin, None, None, None, search_mode)
+    return export.export_response(UserService.get_export_query(conds), UserViewModel, format, "users")
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[UserViewModel])
+async def create_users(
+    request: List[CreateUserModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    users, errors = await UserService.create_users(request, db)
+    return {"items": users, "errors": errors}
+
+@router.put("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[UserViewModel])
+async def update_users(
+    request: List[BulkUpdateUserModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    users, errors = await UserService.update_users(request, db)
+    return {"items": users, "errors": errors}
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK, response_model=BulkResultModel[UUID])
+async def delete_users(
+    user_ids: List[UUID] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    userClaim: UserClaims = Depends(authorizer)
+):
+    if not userClaim.is_active or not userClaim.is_admin:
+        raise AccessDeniedError()
+    
+    deleted, errors = await UserService.delete_users(user_ids, db)
+    return {"items": deleted, "errors": errors}
 
-@router.get("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserViewModel)
+@router.get("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserIncludeViewModel)
 async def get_user_by_id(
-    user_id: UUID, 
-    db: Session = Depends(get_db_context),
+    request: Request,
+    response: Response,
+    user_id: UUID,
+    include: str = Query(default=None, description="Comma separated related records to include: company, tasks"),
+    fields: str = Query(default=None, description="Comma separated fields to return, e.g. id,username,email"),
+    db: AsyncSession = Depends(get_async_read_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active:
         raise AccessDeniedError()
     
-    user = UserService.get_user_by_id(user_id, db)
+    include_paths = utils.parse_include(include, UserInclude)
+    field_names = utils.parse_fields(fields, UserViewModel)
+    user = await UserService.get_user_by_id(user_id, db, include_paths)
     
     if user is None:
         raise ResourceNotFoundError()
     
-    return user
+    view = to_include_view(UserIncludeViewModel, user, include_paths)
+    
+    # Included rows may change without touching the user, so only the ETag covers them.
+    # Only the full record gets a strong ETag, the one If-Match is compared with.
+    if include_paths or field_names:
+        etag = conditional.list_etag(conditional.view_keys([view]))
+    else:
+        etag = conditional.entity_etag(user.id, user.updated_at)
+    not_modified = conditional.not_modified_response(request, response, etag, user.updated_at if not include_paths else None)
+    if not_modified is not None:
+        return not_modified
+    
+    return serialization.view_response(UserIncludeViewModel, view, response, field_names)
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=UserViewModel)
 async def create_user(
     request: CreateUserModel, 
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return UserService.create_user(request, db)
+    return await UserService.create_user(request, db)
 
 @router.put("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserViewModel)
 async def update_user_by_id(
+    response: Response,
     user_id: UUID,
     request: UpdateUserModel,
-    db: Session = Depends(get_db_context),
+    if_match: str = Header(default=None),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    return UserService.update_user_by_id(user_id, request, db)
+    user = await UserService.update_user_by_id(user_id, request, db, if_match)
+    
+    conditional.set_validators(response, conditional.entity_etag(user.id, user.updated_at), user.updated_at)
+    return user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user_by_id(
     user_id: UUID, 
-    db: Session = Depends(get_db_context),
+    db: AsyncSession = Depends(get_async_db_context),
     userClaim: UserClaims = Depends(authorizer)
 ):
     if not userClaim.is_active or not userClaim.is_admin:
         raise AccessDeniedError()
     
-    UserService.delete_user_by_id(user_id, db)
\ No newline at end of file
+    await UserService.delete_user_by_id(user_id, db)
\ No newline at end of file
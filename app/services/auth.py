@@ -1,18 +1,82 @@
+from collections import OrderedDict
 from datetime import timedelta
 from enum import Enum
+import hashlib
+import logging
+import threading
 from typing import Annotated, Optional
 
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 from fastapi import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
 import jwt
 
-from entities.user import User, verify_password
+from entities.user import PENDING_PASSWORD_HASH, User
 from models.auth import UserClaims
 from services.exception import UnAuthorizedError
+from services.jwks import JWKSManager
+from services.metrics import registry
+from services.password import password_hasher
 from services.utils import get_current_timestamp
-from settings import COGNITO, JWT_SECRET, JWT_ALGORITHM
+from settings import COGNITO, JWT_CLAIMS_CACHE_SIZE, JWT_SECRET, JWT_ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+claims_cache_requests = registry.counter(
+    "auth_claims_cache_requests_total",
+    "Token verifications served from or missing the verified claims cache",
+    ("result",),
+)
+claims_cache_size = registry.gauge(
+    "auth_claims_cache_size",
+    "Verified token claims currently cached",
+)
+
+
+class ClaimsCache:
+    """Bounded LRU cache of verified token claims
+
+    Entries are keyed by a digest of the token, so raw tokens are never kept in
+    memory, and expire together with the token's `exp` claim.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, UserClaims] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[UserClaims]:
+        if self.max_size <= 0:
+            return None
+        
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims.exp <= get_current_timestamp():
+                del self._entries[key]
+                claims = None
+            if claims is not None:
+                self._entries.move_to_end(key)
+            claims_cache_size.set(len(self._entries))
+        
+        claims_cache_requests.inc(result="miss" if claims is None else "hit")
+        return claims
+
+    def put(self, token: str, claims: UserClaims) -> None:
+        if self.max_size <= 0:
+            return
+        
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            claims_cache_size.set(len(self._entries))
+
+claims_cache = ClaimsCache(JWT_CLAIMS_CACHE_SIZE)
 
 
 class LocalAuthorizer:
@@ -25,6 +89,10 @@ class LocalAuthorizer:
         if not token:
             raise UnAuthorizedError()
         
+        user = claims_cache.get(token)
+        if user is not None:
+            return user
+        
         try:
             claims = jwt.decode(
                 token,
@@ -36,7 +104,9 @@ class LocalAuthorizer:
                     "verify_exp": True,
                 }
             )
-            return UserClaims(**claims)
+            user = UserClaims(**claims)
+            claims_cache.put(token, user)
+            return user
 
         except jwt.PyJWTError as err:
             print(err)
@@ -56,19 +126,24 @@ class CognitoAuthorizer:
     def __init__(self, token_type: CognitoTokenType = CognitoTokenType.ID_TOKEN) -> None:
         self.token_type = token_type
         self.client_id = COGNITO["CLIENT_ID"]
-        self.jwks_client = jwt.PyJWKClient(
-            uri=COGNITO["JWKS_URL"],
-            cache_keys=True
+        self.jwks = JWKSManager(
+            url=COGNITO["JWKS_URL"],
+            refresh_interval=COGNITO["JWKS_REFRESH_INTERVAL"],
+            min_refresh_interval=COGNITO["JWKS_MIN_REFRESH_INTERVAL"],
         )
 
-    def __call__(self, authorization: Annotated[HTTPAuthorizationCredentials | None, Depends(security_scheme)] = None) -> UserClaims:
+    async def __call__(self, authorization: Annotated[HTTPAuthorizationCredentials | None, Depends(security_scheme)] = None) -> UserClaims:
         if not authorization:
             raise UnAuthorizedError()
 
         token = authorization.credentials
 
+        user = claims_cache.get(token)
+        if user is not None:
+            return user
+
         try:
-            signing_key = self.jwks_client.get_signing_key_from_jwt(token)
+            signing_key = await self.jwks.get_signing_key_from_jwt(token)
 
             claims = jwt.decode(
                 token, 
@@ -85,10 +160,14 @@ class CognitoAuthorizer:
             user.username = claims.get("cognito:username", None)
             user.is_staff = bool(claims.get("custom:is_staff", False))
             print(user)
+            claims_cache.put(token, user)
             return user
         except jwt.PyJWKClientConnectionError:
             print("Cannot connect to JWKS URL")
             raise UnAuthorizedError()
+        except jwt.PyJWKClientError as err:
+            logger.warning("Cannot find the token signing key: %s", err)
+            raise UnAuthorizedError()
         except jwt.PyJWKError as err:
             print(err)
             raise jwt.InvalidTokenError()
@@ -112,11 +191,14 @@ def create_access_token(user: User, expires: Optional[int] = None):
     )
     return jwt.encode(claims.model_dump(), JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def authenticate_user(username: str, password: str, db: Session):
-    user = db.scalars(select(User).filter(User.username == username)).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = (await db.scalars(select(User).filter(User.username == username).options(undefer(User.hashed_password)))).first()
 
     if not user:
+        # Verify against the dummy hash anyway, so that unknown usernames
+        # cannot be told apart by the response time
+        await password_hasher.verify(password, PENDING_PASSWORD_HASH)
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
\ No newline at end of file
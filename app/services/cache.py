@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import logging
+import time
+from typing import Generic, Iterable, Optional, Tuple, Type, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from database import is_replica_read
+from services.metrics import registry
+from settings import ENTITY_CACHE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+entity_cache_requests = registry.counter(
+    "entity_cache_requests_total",
+    "Entity lookups served from or missing the entity cache",
+    ("entity", "result"),
+)
+entity_cache_invalidations = registry.counter(
+    "entity_cache_invalidations_total",
+    "Entity cache entries invalidated after a write",
+    ("entity",),
+)
+entity_cache_errors = registry.counter(
+    "entity_cache_errors_total",
+    "Entity cache backend calls that failed and were skipped",
+    ("operation",),
+)
+
+
+class CacheBackend(ABC):
+    """Key/value store holding serialized entities"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        pass
+
+
+class NullCache(CacheBackend):
+    """Backend used when the cache is disabled, every lookup is a miss"""
+
+    async def get(self, key: str) -> Optional[str]:
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache whose entries expire after a fixed TTL
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_size: int, ttl: int) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisCache(CacheBackend):
+    """Cache shared between processes on any server speaking the Redis protocol
+
+    Requires the optional `redis` package. The cache fails open: when the
+    server cannot be reached, lookups are misses and writes are skipped, so
+    requests fall back to the database instead of failing.
+    """
+
+    def __init__(self, url: str, ttl: int) -> None:
+        try:
+            from redis import asyncio as redis
+            from redis.exceptions import RedisError
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for the redis entity cache backend") from e
+
+        self.ttl = ttl
+        self._client = redis.from_url(url, decode_responses=True)
+        self._errors = (RedisError, OSError)
+
+    def _failed(self, operation: str, err: Exception) -> None:
+        entity_cache_errors.inc(operation=operation)
+        logger.warning("Entity cache %s failed, skipping the cache: %s", operation, err)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self._client.get(key)
+        except self._errors as err:
+            self._failed("get", err)
+            return None
+
+    async def set(self, key: str, value: str) -> None:
+        try:
+            await self._client.set(key, value, ex=self.ttl)
+        except self._errors as err:
+            self._failed("set", err)
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            await self._client.delete(*keys)
+        except self._errors as err:
+            self._failed("delete", err)
+
+
+class EntityCache(Generic[T]):
+    """Read-through cache of the view models of one entity, keyed by ID"""
+
+    def __init__(self, entity: str, model: Type[T], backend: CacheBackend) -> None:
+        self.entity = entity
+        self.model = model
+        self.backend = backend
+
+    def key(self, entity_id: UUID) -> str:
+        return f"{self.entity}:{entity_id}"
+
+    async def get(self, entity_id: UUID) -> Optional[T]:
+        value = await self.backend.get(self.key(entity_id))
+        entity_cache_requests.inc(entity=self.entity, result="miss" if value is None else "hit")
+        return self.model.model_validate_json(value) if value is not None else None
+
+    async def put(self, entity_id: UUID, item: T, db) -> None:
+        """Cache an item read with the session `db`
+
+        Items read from a lagging replica are not cached, they could bring
+        back a row that a write on the primary has just invalidated.
+        """
+        if is_replica_read(db):
+            return
+        await self.backend.set(self.key(entity_id), item.model_dump_json())
+
+    async def invalidate(self, entity_ids: Iterable[UUID]) -> None:
+        keys = [self.key(entity_id) for entity_id in entity_ids]
+        if keys:
+            await self.backend.delete(*keys)
+            entity_cache_invalidations.inc(len(keys), entity=self.entity)
+
+
+def create_backend() -> CacheBackend:
+    if ENTITY_CACHE["BACKEND"] == "redis":
+        return RedisCache(ENTITY_CACHE["URL"], ENTITY_CACHE["TTL"])
+    if ENTITY_CACHE["BACKEND"] == "memory":
+        return MemoryCache(ENTITY_CACHE["MAX_SIZE"], ENTITY_CACHE["TTL"])
+    return NullCache()
+
+backend = create_backend()
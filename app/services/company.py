@@ -1,49 +1,112 @@
-from uuid import UUID
-from typing import List
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from uuid import UUID, uuid4
+from typing import FrozenSet, List, Set, Tuple
+from sqlalchemy import delete, insert, Row, Select, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from entities.company import Company
-from models.company import CreateCompanyModel, SearchCompanyModel, UpdateCompanyModel
+from entities.user import User
+from models.bulk import BulkItemError
+from models.include import CompanyInclude
+from models.company import BulkUpdateCompanyModel, CompanyViewModel, CreateCompanyModel, SearchCompanyModel, UpdateCompanyModel
 from services import utils
-from services.exception import ResourceNotFoundError
+from services.cache import backend, EntityCache
+from services import conditional
+from services import serialization
+from services.exception import InvalidInputError, ResourceNotFoundError
 
-def get_all_companies(conds: SearchCompanyModel, db: Session) -> List[Company]:
+cache = EntityCache("company", CompanyViewModel, backend)
+
+# Loader options of the ?include= paths, each related table is read in one extra query at most
+INCLUDE_OPTIONS = {
+    CompanyInclude.USERS.value: selectinload(Company.users),
+    CompanyInclude.TASKS.value: selectinload(Company.users).selectinload(User.tasks),
+}
+
+def build_search_query(conds: SearchCompanyModel) -> Select:
     query = select(Company)
     
     if conds.name is not None:
-        query = query.filter(Company.name.like(f"{conds.name}%"))
+        query = query.filter(utils.text_filter(Company.name, conds.name, conds.search_mode))
     if conds.description is not None:
-        query = query.filter(Company.description.like(f"{conds.description}%"))
+        query = query.filter(utils.text_filter(Company.description, conds.description, conds.search_mode))
     if conds.mode is not None:
         query = query.filter(Company.mode == conds.mode)
     query = query.filter(Company.rating >= conds.rating)
     
-    query = query.offset((conds.page-1)*conds.size).limit(conds.size)
+    return query
+
+async def get_all_companies(conds: SearchCompanyModel, db: AsyncSession, include: Set[str] = frozenset()) -> List[Company]:
+    query = utils.paginate(build_search_query(conds), Company, conds)
+    query = query.options(*[INCLUDE_OPTIONS[path] for path in include])
+    
+    return (await db.scalars(query)).all()
+
+async def get_all_companies_rows(conds: SearchCompanyModel, db: AsyncSession, fields: FrozenSet[str] = None) -> List[Row]:
+    """Same page as get_all_companies, as row tuples holding only the requested CompanyViewModel columns"""
+    query = build_search_query(conds).with_only_columns(*serialization.get_view_columns(Company, CompanyViewModel, fields))
+    query = utils.paginate(query, Company, conds)
+    
+    return (await db.execute(query)).all()
+
+def get_export_query(conds: SearchCompanyModel) -> Select:
+    return build_search_query(conds).order_by(Company.created_at, Company.id)
+
+async def get_company_by_id(company_id: UUID, db: AsyncSession, include: Set[str] = frozenset()) -> CompanyViewModel | Company:
+    # Related rows are not cached, views including them are read from the database
+    if include:
+        query = select(Company).filter(Company.id == company_id).options(*[INCLUDE_OPTIONS[path] for path in include])
+        return (await db.scalars(query)).first()
+    
+    company = await cache.get(company_id)
+    
+    if company is None:
+        entity = await get_company_entity_by_id(company_id, db)
+        if entity is None:
+            return None
+        company = CompanyViewModel.model_validate(entity)
+        await cache.put(company_id, company, db)
     
-    return db.scalars(query).all()
+    return company
 
-def get_company_by_id(company_id: UUID, db: Session) -> Company:
-    return db.scalars(select(Company).filter(Company.id == company_id)).first()
+async def get_company_entity_by_id(company_id: UUID, db: AsyncSession, for_update: bool = False) -> Company:
+    query = select(Company).filter(Company.id == company_id)
+    if for_update:
+        query = query.with_for_update()
+    return (await db.scalars(query)).first()
 
-def create_company(data: CreateCompanyModel, db: Session) -> Company:
+async def create_company(data: CreateCompanyModel, db: AsyncSession) -> Company:
     company = Company(**data.model_dump())
     
     company.created_at = utils.get_current_utc_time()
     company.updated_at = utils.get_current_utc_time()
     
     db.add(company)
-    db.commit()
-    db.refresh(company)
+    await db.commit()
+    await db.refresh(company)
     
     return company
 
-def update_company_by_id(company_id: UUID, data: UpdateCompanyModel, db: Session) -> Company:
-    company = get_company_by_id(company_id, db)
+async def update_company_by_id(company_id: UUID, data: UpdateCompanyModel, db: AsyncSession, if_match: str = None) -> Company:
+    if if_match is not None:
+        # Only conditional updates read the row first, it stays locked until the update
+        company = await get_company_entity_by_id(company_id, db, for_update=True)
+        if company is None:
+            raise ResourceNotFoundError()
+        conditional.check_if_match(if_match, company.id, company.updated_at)
+    
+    company = await utils.update_by_id(Company, company_id, data.model_dump(exclude_none=True), db)
     
     if company is None:
         raise ResourceNotFoundError()
     
+    await db.commit()
+    await cache.invalidate([company_id])
+    
+    return company
+
+def apply_update(company: Company, data: UpdateCompanyModel) -> None:
     updated = False
     if data.name is not None:
         company.name = data.name
@@ -59,17 +122,76 @@ def update_company_by_id(company_id: UUID, data: UpdateCompanyModel, db: Session
         updated = True
     if updated:
         company.updated_at = utils.get_current_utc_time()
+
+async def delete_company_by_id(company_id: UUID, db: AsyncSession) -> None:
+    try:
+        deleted = await utils.delete_by_id(Company, company_id, db)
+    except IntegrityError:
+        raise InvalidInputError("Company still has users")
     
-    db.commit()
-    db.refresh(company)
+    if not deleted:
+        raise ResourceNotFoundError()
     
-    return company
+    await db.commit()
+    await cache.invalidate([company_id])
 
-def delete_company_by_id(company_id: UUID, db: Session) -> None:
-    company = get_company_by_id(company_id, db)
+async def create_companies(items: List[CreateCompanyModel], db: AsyncSession) -> Tuple[List[Company], List[BulkItemError]]:
+    values = [
+        {
+            **item.model_dump(),
+            "id": uuid4(),
+            "created_at": utils.get_current_utc_time(),
+            "updated_at": utils.get_current_utc_time(),
+        }
+        for item in items
+    ]
     
-    if company is None:
-        raise ResourceNotFoundError()
+    # A single multi-row INSERT ... RETURNING per batch of rows
+    companies = (await db.scalars(insert(Company).returning(Company, sort_by_parameter_order=True), values)).all()
+    await db.commit()
+    
+    return companies, []
+
+async def update_companies(items: List[BulkUpdateCompanyModel], db: AsyncSession) -> Tuple[List[Company], List[BulkItemError]]:
+    companies = {company.id: company for company in (await db.scalars(select(Company).filter(Company.id.in_({item.id for item in items})))).all()}
+    
+    updated = []
+    errors = []
+    for index, item in enumerate(items):
+        company = companies.get(item.id)
+        if company is None:
+            errors.append(BulkItemError(index=index, id=item.id, detail="Resource not found"))
+            continue
+        apply_update(company, item)
+        updated.append(company)
+    
+    await db.commit()
+    await cache.invalidate([company.id for company in updated])
+    
+    return updated, errors
+
+async def delete_companies(company_ids: List[UUID], db: AsyncSession) -> Tuple[List[UUID], List[BulkItemError]]:
+    # Companies that still have users cannot be deleted without breaking the
+    # users.company_id foreign key, so they are reported instead of failing the batch.
+    # The companies are locked first: a concurrent user insert then waits for
+    # this transaction, so the check cannot miss its user.
+    await db.execute(select(Company.id).filter(Company.id.in_(set(company_ids))).order_by(Company.id).with_for_update())
+    referenced = set((await db.scalars(select(User.company_id).filter(User.company_id.in_(set(company_ids))).distinct())).all())
+    
+    deletable = set(company_ids) - referenced
+    deleted = set()
+    if deletable:
+        try:
+            deleted = set((await db.scalars(delete(Company).filter(Company.id.in_(deletable)).returning(Company.id))).all())
+        except IntegrityError:
+            raise InvalidInputError("Company still has users")
+        await db.commit()
+        await cache.invalidate(deleted)
     
-    db.delete(company)
-    db.commit()
\ No newline at end of file
+    errors = []
+    for index, company_id in enumerate(company_ids):
+        if company_id in referenced:
+            errors.append(BulkItemError(index=index, id=company_id, detail="Company still has users"))
+        elif company_id not in deleted:
+            errors.append(BulkItemError(index=index, id=company_id, detail="Resource not found"))
+    return [company_id for company_id in company_ids if company_id in deleted], errors
\ No newline at end of file
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+from typing import Iterable, Iterator, Optional
+from uuid import UUID
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+from services.exception import PreconditionFailedError
+
+def entity_etag(id: UUID, updated_at: datetime) -> str:
+    """Strong ETag of the full representation of a single record, changing whenever the record is updated"""
+    return f'"{keys_digest([(id, updated_at)])}"'
+
+def list_etag(keys: Iterable[tuple[UUID, datetime]]) -> str:
+    """Weak ETag of a page of records, or of a record with included or sparse fields"""
+    return f'W/"{keys_digest(keys)}"'
+
+def keys_digest(keys: Iterable[tuple[UUID, datetime]]) -> str:
+    digest = hashlib.sha256()
+    for id, updated_at in keys:
+        digest.update(f"{id}:{as_utc(updated_at).isoformat()};".encode())
+    return digest.hexdigest()[:32]
+
+def view_keys(views: Iterable[BaseModel]) -> Iterator[tuple[UUID, datetime]]:
+    """(id, updated_at) keys of views and of the related views included in them"""
+    for view in views:
+        yield view.id, view.updated_at
+        for value in dict(view).values():
+            if isinstance(value, BaseModel):
+                yield from view_keys([value])
+            elif isinstance(value, list):
+                yield from view_keys(item for item in value if isinstance(item, BaseModel))
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def etag_matches(header: str, etag: str, strong: bool = False) -> bool:
+    """Compare an ETag against an If-None-Match / If-Match header
+
+    If-None-Match uses the weak comparison and If-Match the strong one, in
+    which weak ETags never match (RFC 9110 8.8.3.2).
+    """
+    if header.strip() == "*":
+        return True
+    if strong:
+        return not etag.startswith("W/") and any(candidate.strip() == etag for candidate in header.split(","))
+    return any(candidate.strip().removeprefix("W/") == etag.removeprefix("W/") for candidate in header.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-Modified-Since is ignored whenever If-None-Match is sent (RFC 9110 13.1.3)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have a one second resolution
+    return as_utc(last_modified).replace(microsecond=0) <= since
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime]) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(as_utc(last_modified), usegmt=True)
+
+def not_modified_response(request: Request, response: Response, etag: str, last_modified: Optional[datetime]) -> Optional[Response]:
+    """Set the validators of a GET response, returning a 304 response when the client copy is still fresh"""
+    set_validators(response, etag, last_modified)
+    if not is_not_modified(request, etag, last_modified):
+        return None
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+def check_if_match(if_match: Optional[str], id: UUID, updated_at: datetime) -> None:
+    """Reject a write whose If-Match header does not match the current version of the record"""
+    if if_match is not None and not etag_matches(if_match, entity_etag(id, updated_at), strong=True):
+        raise PreconditionFailedError()
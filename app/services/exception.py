@@ -21,4 +21,20 @@ class AccessDeniedError(HTTPException):
 class InvalidInputError(HTTPException):
     def __init__(self, msg=None):
         super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, 
-                            detail="Invalid input data" if msg is None else msg)
\ No newline at end of file
+                            detail="Invalid input data" if msg is None else msg)
+
+class PreconditionFailedError(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Resource has been modified")
+
+class ServiceUnavailableError(HTTPException):
+    def __init__(self, msg=None, retry_after: int = 1):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Service temporarily unavailable" if msg is None else msg,
+                            headers={"Retry-After": str(retry_after)})
+
+class TooManyRequestsError(HTTPException):
+    def __init__(self, msg=None, retry_after: int = 1):
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many requests" if msg is None else msg,
+                            headers={"Retry-After": str(retry_after)})
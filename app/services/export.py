@@ -0,0 +1,64 @@
+"""Streaming exports of query results
+
+Rows are read through a server-side cursor and encoded one partition at a
+time, so the memory used by an export does not grow with the number of rows.
+"""
+
+import csv
+import io
+from typing import AsyncIterator, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Select
+from fastapi.responses import StreamingResponse
+
+from database import AsyncSessionLocal
+from models.export import ExportFormat
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def stream_partitions(query: Select) -> AsyncIterator[list]:
+    # The request scoped session is closed before a streaming response body
+    # is sent, so the export owns its (read replica) session for as long as it streams.
+    async with AsyncSessionLocal(info={"replica": True}) as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def encode_ndjson(partitions: AsyncIterator[list], view_model: Type[BaseModel]) -> AsyncIterator[bytes]:
+    async for partition in partitions:
+        yield b"".join(view_model.model_validate(row).model_dump_json().encode() + b"\n" for row in partition)
+
+
+async def encode_csv(partitions: AsyncIterator[list], view_model: Type[BaseModel]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(view_model.model_fields))
+    writer.writeheader()
+    
+    async for partition in partitions:
+        writer.writerows(view_model.model_validate(row).model_dump(mode="json") for row in partition)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(query: Select, view_model: Type[BaseModel], format: ExportFormat, filename: str) -> StreamingResponse:
+    partitions = stream_partitions(query)
+    content = encode_csv(partitions, view_model) if format == ExportFormat.CSV else encode_ndjson(partitions, view_model)
+    extension = format.value.lower()
+    
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
@@ -0,0 +1,167 @@
+"""Request and database instrumentation
+
+An ASGI middleware records per-route latency, in-flight requests and response
+sizes, while SQLAlchemy cursor events time every query and attribute it to the
+request being served, flagging requests that repeat the same statement over and
+over, the usual signature of an N+1 access pattern.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from services.metrics import registry
+from settings import N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+requests_in_flight = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+response_size = registry.counter(
+    "http_response_size_bytes_total",
+    "Bytes sent in HTTP response bodies by route",
+    ("method", "route"),
+)
+query_duration = registry.histogram(
+    "db_query_duration_seconds",
+    "Database query latency",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+request_queries = registry.histogram(
+    "db_queries_per_request",
+    "Database queries issued while serving a request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_query_duration = registry.histogram(
+    "db_query_duration_per_request_seconds",
+    "Time spent in database queries while serving a request",
+    ("route",),
+)
+pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Database pool connections by state",
+    ("engine", "state"),
+)
+pool_size = registry.gauge(
+    "db_pool_size",
+    "Configured size of the database connection pool",
+    ("engine",),
+)
+n_plus_one = registry.counter(
+    "db_n_plus_one_total",
+    "Requests that repeated the same statement at least N_PLUS_ONE_THRESHOLD times",
+    ("route",),
+)
+
+
+class RequestQueryStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+current_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def get_route_label(scope: dict) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        status_code = 500
+        body_size = 0
+        
+        async def send_wrapper(message):
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+        
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec()
+            current_query_stats.reset(token)
+            
+            route = get_route_label(scope)
+            method = scope["method"]
+            request_duration.observe(elapsed, method=method, route=route, status=status_code)
+            response_size.inc(body_size, method=method, route=route)
+            request_queries.observe(stats.count, route=route)
+            request_query_duration.observe(stats.duration, route=route)
+            
+            if stats.statements:
+                statement, repeats = stats.statements.most_common(1)[0]
+                if repeats >= N_PLUS_ONE_THRESHOLD:
+                    n_plus_one.inc(route=route)
+                    logger.warning("Possible N+1 query pattern on %s %s, statement executed %d times: %s", method, route, repeats, statement)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    query_duration.observe(elapsed)
+    
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        stats.statements[statement] += 1
+
+
+def handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    
+    def collect():
+        pool_size.set(pool.size(), engine=name)
+        pool_connections.set(pool.checkedout(), engine=name, state="checked_out")
+        pool_connections.set(pool.checkedin(), engine=name, state="checked_in")
+        pool_connections.set(max(pool.overflow(), 0), engine=name, state="overflow")
+    
+    registry.add_collector(collect)
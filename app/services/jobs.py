@@ -0,0 +1,336 @@
+"""Background jobs
+
+Slow side effects of a write, such as hashing the default password of a new
+user, run after the response in a pool of workers instead of on the request
+path. A job is enqueued in the transaction of its write and only reaches the
+workers once that transaction commits, a rolled back write never runs its
+jobs.
+
+Handlers are registered by name with the `handler` decorator. They receive the
+JSON payload of the job and a database session, which the queue commits once
+the handler returns. Failing jobs are retried with an exponential backoff, up
+to JOB_QUEUE["MAX_ATTEMPTS"] attempts, so handlers must be idempotent. Work
+whose job was lost or ran out of attempts is enqueued again by the functions
+registered with the `sweeper` decorator.
+
+The default `memory` backend keeps the jobs in process, they are lost if the
+process dies before running them. The `postgres` backend inserts them in the
+jobs table with the write, and the workers of every API process claim them
+with SELECT ... FOR UPDATE SKIP LOCKED. A job is deleted in the transaction
+of its handler, so its effects are committed exactly once.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List
+from uuid import uuid4
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from entities.job import Job
+from services import utils
+from services.exception import ServiceUnavailableError
+from services.metrics import registry
+from settings import JOB_QUEUE
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding the in-process jobs enqueued in the current transaction
+PENDING_JOBS = "pending_jobs"
+
+Handler = Callable[[dict, AsyncSession], Awaitable[None]]
+handlers: Dict[str, Handler] = {}
+Sweeper = Callable[[AsyncSession], Awaitable[None]]
+sweepers: List[Sweeper] = []
+
+job_attempts = registry.counter(
+    "job_attempts_total",
+    "Background job attempts by result",
+    ("name", "result"),
+)
+job_duration = registry.histogram(
+    "job_duration_seconds",
+    "Duration of the background job attempts",
+    ("name",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+queue_depth = registry.gauge(
+    "job_queue_depth",
+    "In-process background jobs waiting for a worker",
+)
+
+
+def handler(name: str):
+    """Register the decorated coroutine as the handler of the jobs called `name`"""
+    def register(func: Handler) -> Handler:
+        handlers[name] = func
+        return func
+    return register
+
+
+def sweeper(func: Sweeper) -> Sweeper:
+    """Register a coroutine enqueueing again the work whose job was lost or ran out of attempts
+
+    Sweepers run when the queue starts and then every JOB_QUEUE["SWEEP_INTERVAL"]
+    seconds, 0 disables them, in a transaction committed once they return.
+    """
+    sweepers.append(func)
+    return func
+
+
+async def sweep() -> None:
+    for func in sweepers:
+        try:
+            async with AsyncSessionLocal() as db:
+                await func(db)
+                await db.commit()
+        except Exception as err:
+            logger.warning("Background job sweep %s failed: %s", func.__name__, err)
+
+
+def get_retry_delay(attempts: int) -> float:
+    return JOB_QUEUE["RETRY_DELAY"] * 2 ** (attempts - 1)
+
+
+async def run_handler(name: str, payload: dict, db: AsyncSession) -> None:
+    started = time.perf_counter()
+    try:
+        await handlers[name](payload, db)
+    finally:
+        job_duration.observe(time.perf_counter() - started, name=name)
+
+
+@dataclass
+class QueuedJob:
+    name: str
+    payload: dict
+
+
+class JobQueue(ABC):
+    """Worker pool running the jobs of a backend"""
+
+    def __init__(self, workers: int, drain_timeout: float, sweep_interval: int) -> None:
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.sweep_interval = sweep_interval
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    @abstractmethod
+    async def enqueue(self, name: str, payload: dict, db: AsyncSession) -> None:
+        """Enqueue a job in the transaction of the session, it runs once the transaction commits"""
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def stop(self) -> None:
+        """Stop taking new jobs, wait up to the drain timeout for the queued ones, then cancel the workers"""
+        if not self._workers:
+            return
+
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._drain(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Background jobs still pending after %s s, cancelling them", self.drain_timeout)
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def check_handler(self, name: str) -> None:
+        if name not in handlers:
+            raise ValueError(f"Unknown background job: {name}")
+
+    @abstractmethod
+    async def _drain(self) -> None:
+        """Wait for the jobs already enqueued"""
+
+    @abstractmethod
+    async def _work(self) -> None:
+        """Worker loop, running jobs until cancelled"""
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await sweep()
+            await asyncio.sleep(self.sweep_interval)
+
+
+class MemoryJobQueue(JobQueue):
+    """Jobs of the current process, at most `max_size` of them waiting
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, workers: int, drain_timeout: float, sweep_interval: int, max_size: int) -> None:
+        super().__init__(workers, drain_timeout, sweep_interval)
+        self.max_size = max_size
+        self._queue: asyncio.Queue[QueuedJob] = asyncio.Queue()
+
+    async def enqueue(self, name: str, payload: dict, db: AsyncSession) -> None:
+        self.check_handler(name)
+        pending = db.info.setdefault(PENDING_JOBS, [])
+        if self._stopping.is_set() or self._queue.qsize() + len(pending) >= self.max_size:
+            raise ServiceUnavailableError("Too many background jobs pending, please retry later")
+        pending.append(QueuedJob(name, payload))
+
+    def release(self, jobs: List[QueuedJob]) -> None:
+        """Hand the jobs of a committed transaction to the workers"""
+        for job in jobs:
+            self._queue.put_nowait(job)
+        queue_depth.set(self._queue.qsize())
+
+    async def _drain(self) -> None:
+        await self._queue.join()
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            queue_depth.set(self._queue.qsize())
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: QueuedJob) -> None:
+        for attempts in range(1, JOB_QUEUE["MAX_ATTEMPTS"] + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await run_handler(job.name, job.payload, db)
+                    await db.commit()
+            except Exception as err:
+                if attempts >= JOB_QUEUE["MAX_ATTEMPTS"]:
+                    job_attempts.inc(name=job.name, result="failed")
+                    logger.error("Background job %s failed after %s attempts: %s", job.name, attempts, err)
+                    return
+                job_attempts.inc(name=job.name, result="retried")
+                await asyncio.sleep(get_retry_delay(attempts))
+            else:
+                job_attempts.inc(name=job.name, result="succeeded")
+                return
+
+
+class PostgresJobQueue(JobQueue):
+    """Jobs stored in the jobs table, shared by the workers of every process
+
+    Failed jobs are kept with their last error once out of attempts.
+    """
+
+    def __init__(self, workers: int, drain_timeout: float, sweep_interval: int, poll_interval: float) -> None:
+        super().__init__(workers, drain_timeout, sweep_interval)
+        self.poll_interval = poll_interval
+
+    async def enqueue(self, name: str, payload: dict, db: AsyncSession) -> None:
+        self.check_handler(name)
+        now = utils.get_current_utc_time()
+        await db.execute(insert(Job).values(
+            id=uuid4(),
+            name=name,
+            payload=payload,
+            attempts=0,
+            run_at=now,
+            created_at=now,
+            updated_at=now,
+        ))
+
+    async def _drain(self) -> None:
+        # Workers leave their loop once their current job is done
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = await self._run_next()
+            except Exception as err:
+                logger.warning("Cannot poll the jobs table: %s", err)
+                claimed = False
+
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run_next(self) -> bool:
+        """Run the next due job, return False when there is none"""
+        async with AsyncSessionLocal() as db:
+            now = utils.get_current_utc_time()
+            job = (await db.scalars(
+                select(Job)
+                .filter(Job.failed_at.is_(None), Job.run_at <= now)
+                .order_by(Job.run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).first()
+
+            if job is None:
+                return False
+            job_id, name, attempts = job.id, job.name, job.attempts + 1
+
+            # The handler runs in a savepoint, so that a failure only rolls
+            # back its own work and the job stays locked until it is rescheduled
+            try:
+                async with db.begin_nested():
+                    await run_handler(name, job.payload, db)
+            except Exception as err:
+                now = utils.get_current_utc_time()
+                values = {"attempts": attempts, "last_error": str(err), "updated_at": now}
+                if attempts >= JOB_QUEUE["MAX_ATTEMPTS"]:
+                    values["failed_at"] = now
+                    job_attempts.inc(name=name, result="failed")
+                    logger.error("Background job %s failed after %s attempts: %s", name, attempts, err)
+                else:
+                    values["run_at"] = now + timedelta(seconds=get_retry_delay(attempts))
+                    job_attempts.inc(name=name, result="retried")
+                await db.execute(update(Job).filter(Job.id == job_id).values(**values))
+            else:
+                await db.execute(delete(Job).filter(Job.id == job_id))
+                job_attempts.inc(name=name, result="succeeded")
+
+            await db.commit()
+
+        return True
+
+
+def create_queue() -> JobQueue:
+    if JOB_QUEUE["BACKEND"] == "postgres":
+        return PostgresJobQueue(JOB_QUEUE["WORKERS"], JOB_QUEUE["DRAIN_TIMEOUT"], JOB_QUEUE["SWEEP_INTERVAL"], JOB_QUEUE["POLL_INTERVAL"])
+    return MemoryJobQueue(JOB_QUEUE["WORKERS"], JOB_QUEUE["DRAIN_TIMEOUT"], JOB_QUEUE["SWEEP_INTERVAL"], JOB_QUEUE["MAX_SIZE"])
+
+job_queue = create_queue()
+
+async def enqueue(name: str, payload: dict, db: AsyncSession) -> None:
+    await job_queue.enqueue(name, payload, db)
+
+
+@event.listens_for(Session, "after_commit")
+def release_committed_jobs(session: Session) -> None:
+    # Also fired when a savepoint is released, the jobs wait for the outermost commit
+    if session.in_nested_transaction():
+        return
+    jobs = session.info.pop(PENDING_JOBS, None)
+    if jobs:
+        job_queue.release(jobs)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_rolled_back_jobs(session: Session, transaction) -> None:
+    # Committed jobs were already released by after_commit
+    if transaction.parent is None:
+        session.info.pop(PENDING_JOBS, None)
@@ -0,0 +1,103 @@
+"""Asynchronous JWKS key management
+
+Signing keys are fetched at startup and refreshed in the background before
+they go stale, so token verification never waits on the JWKS endpoint in the
+common case. Concurrent refreshes, e.g. a burst of tokens signed with a newly
+rotated key, are collapsed into a single in-flight fetch, and the last good key
+set keeps being served while the endpoint is unavailable.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+import urllib.request
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class JWKSManager:
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: int = 3600,
+        min_refresh_interval: int = 30,
+        timeout: int = 5,
+    ) -> None:
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._max_age = refresh_interval
+        self._last_attempt = 0.0
+        self._inflight: asyncio.Task | None = None
+        self._background: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._background = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+
+    async def get_signing_key(self, kid: str) -> jwt.PyJWK:
+        key = self._keys.get(kid)
+        
+        # An unknown key id usually means the keys were rotated. Refreshing is
+        # rate limited so that tokens with bogus key ids cannot hammer the endpoint.
+        if key is None and time.monotonic() - self._last_attempt >= self.min_refresh_interval:
+            await self.refresh()
+            key = self._keys.get(kid)
+        
+        if key is None:
+            if not self._keys:
+                raise jwt.PyJWKClientConnectionError(f"No signing keys available from {self.url}")
+            raise jwt.PyJWKClientError(f"Unable to find a signing key that matches: {kid}")
+        return key
+
+    async def get_signing_key_from_jwt(self, token: str) -> jwt.PyJWK:
+        header = jwt.get_unverified_header(token)
+        return await self.get_signing_key(header.get("kid"))
+
+    async def refresh(self) -> bool:
+        """Refresh the key set, joining the fetch already in flight if there is one"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> bool:
+        self._last_attempt = time.monotonic()
+        try:
+            data, max_age = await asyncio.to_thread(self._download)
+            key_set = jwt.PyJWKSet.from_dict(data)
+        except Exception as err:
+            logger.warning("Cannot refresh JWKS from %s, serving %d cached keys: %s", self.url, len(self._keys), err)
+            return False
+        
+        self._keys = {key.key_id: key for key in key_set.keys}
+        self._max_age = max_age or self.refresh_interval
+        return True
+
+    def _download(self) -> tuple[dict, int | None]:
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            max_age = MAX_AGE_PATTERN.search(response.headers.get("Cache-Control", ""))
+            return json.load(response), int(max_age.group(1)) if max_age else None
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            # Refresh ahead of the advertised lifetime, and retry sooner after a failure
+            delay = self._max_age * 0.8 if self._keys else self.min_refresh_interval
+            await asyncio.sleep(max(delay, self.min_refresh_interval))
+            await self.refresh()
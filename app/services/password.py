@@ -0,0 +1,107 @@
+"""Password hashing offloaded to a bounded worker pool
+
+bcrypt burns hundreds of milliseconds of CPU per call, so running it on the
+event loop thread freezes every other request on the worker. Calls are handed
+to a thread or process pool instead, and callers are rejected with a 503 once
+the pool and its queue are full.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from entities.user import get_password_hash, verify_password
+from services.exception import ServiceUnavailableError
+from services.metrics import registry
+from settings import PASSWORD_HASHING
+
+queue_depth = registry.gauge(
+    "password_hashing_queue_depth",
+    "Password hashing calls waiting for a free worker",
+)
+in_flight = registry.gauge(
+    "password_hashing_in_flight",
+    "Password hashing calls submitted to the worker pool",
+)
+rejected = registry.counter(
+    "password_hashing_rejected_total",
+    "Password hashing calls rejected because the pool was saturated",
+    ("operation",),
+)
+latency = registry.histogram(
+    "password_hashing_duration_seconds",
+    "Password hashing latency including the time spent queued",
+    ("operation",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class PasswordHasher:
+    def __init__(self, executor: str = "thread", workers: int = 1, max_queue_size: int = 0) -> None:
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unsupported password hashing executor: {executor}")
+        
+        self.executor_type = executor
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hashing")
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", get_password_hash, password)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        # Bulk callers keep at most one call per worker in flight, so a large
+        # batch waits here instead of overflowing the bounded queue.
+        semaphore = asyncio.Semaphore(self.workers)
+        
+        async def hash_one(password: str) -> str:
+            async with semaphore:
+                return await self.hash(password)
+        
+        return list(await asyncio.gather(*[hash_one(password) for password in passwords]))
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", verify_password, plain_password, hashed_password)
+
+    async def _submit(self, operation: str, func, *args):
+        # The event loop is single threaded, so the check and the increment
+        # below cannot interleave with another submission.
+        if self.pending >= self.workers + self.max_queue_size:
+            rejected.inc(operation=operation)
+            raise ServiceUnavailableError("Too many concurrent password operations, please retry later")
+        
+        self.pending += 1
+        self._record_depth()
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self._record_depth()
+            latency.observe(time.perf_counter() - started, operation=operation)
+
+    def _record_depth(self) -> None:
+        in_flight.set(self.pending)
+        queue_depth.set(max(self.pending - self.workers, 0))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=PASSWORD_HASHING["EXECUTOR"],
+    workers=PASSWORD_HASHING["WORKERS"],
+    max_queue_size=PASSWORD_HASHING["MAX_QUEUE_SIZE"],
+)
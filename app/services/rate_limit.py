@@ -0,0 +1,156 @@
+"""Token bucket rate limiting of the login endpoint
+
+Each key, a client IP or a username, owns a bucket holding at most
+`capacity` tokens and refilled with `per_minute` tokens every minute. Every
+login attempt takes a token, and attempts finding the bucket empty are
+rejected with a 429 before any database query or bcrypt call, so that a
+credential stuffing burst costs a dictionary lookup per request instead of
+a bcrypt verification.
+
+Buckets live in process memory by default. The Redis backend shares them
+between the API processes.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import time
+from typing import Optional, Tuple
+
+from services.exception import TooManyRequestsError
+from services.metrics import registry
+from settings import LOGIN_RATE_LIMIT
+
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests rejected because their token bucket was empty",
+    ("limiter",),
+)
+
+# Refills, takes a token and returns the seconds to wait before the next one
+# when the bucket is empty, atomically and using the server clock so that
+# every API process sees the same buckets
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+return tostring(wait)
+"""
+
+
+class RateLimitBackend(ABC):
+    """Store of the token buckets"""
+
+    @abstractmethod
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token, return 0 or the seconds to wait when the bucket is empty"""
+
+
+class NullRateLimit(RateLimitBackend):
+    """Backend used when rate limiting is disabled, buckets are never empty"""
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        return 0
+
+
+class MemoryRateLimit(RateLimitBackend):
+    """Buckets of the current process, the least recently used are dropped beyond `max_size`
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+
+        wait = 0
+        if tokens < 1:
+            wait = (1 - tokens) / rate
+        else:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisRateLimit(RateLimitBackend):
+    """Buckets shared between processes on any server speaking the Redis protocol
+
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str) -> None:
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for the redis rate limit backend") from e
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(await self._take(keys=[f"rate_limit:{key}"], args=[capacity, rate]))
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, backend: RateLimitBackend, capacity: int, per_minute: float) -> None:
+        self.name = name
+        self.backend = backend
+        self.capacity = capacity
+        self.rate = per_minute / 60
+
+    async def hit(self, key: Optional[str]) -> None:
+        """Take a token from the bucket of the key, raise a 429 when it is empty
+
+        A bucket that is never refilled would lock the key out for good, so a
+        rate of 0 or less disables the limiter instead.
+        """
+        if key is None or self.rate <= 0:
+            return
+
+        wait = await self.backend.take(f"{self.name}:{key}", self.capacity, self.rate)
+        if wait > 0:
+            rate_limit_rejections.inc(limiter=self.name)
+            raise TooManyRequestsError("Too many login attempts, please retry later", retry_after=int(wait) + 1)
+
+
+def create_backend() -> RateLimitBackend:
+    if LOGIN_RATE_LIMIT["BACKEND"] == "redis":
+        return RedisRateLimit(LOGIN_RATE_LIMIT["URL"])
+    if LOGIN_RATE_LIMIT["BACKEND"] == "memory":
+        return MemoryRateLimit(LOGIN_RATE_LIMIT["MAX_KEYS"])
+    return NullRateLimit()
+
+backend = create_backend()
+ip_limiter = TokenBucketLimiter("login_ip", backend, LOGIN_RATE_LIMIT["IP_CAPACITY"], LOGIN_RATE_LIMIT["IP_PER_MINUTE"])
+username_limiter = TokenBucketLimiter("login_username", backend, LOGIN_RATE_LIMIT["USERNAME_CAPACITY"], LOGIN_RATE_LIMIT["USERNAME_PER_MINUTE"])
+
+async def check_login(client_ip: Optional[str], username: str) -> None:
+    """Throttle a login attempt per client IP, then per username
+
+    Usernames are compared case-insensitively so that case variations share
+    a bucket. An IP already throttled does not drain the bucket of the
+    username it targets.
+    """
+    await ip_limiter.hit(client_ip)
+    await username_limiter.hit(username.strip().lower())
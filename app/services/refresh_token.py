@@ -0,0 +1,167 @@
+"""Refresh tokens
+
+Long-running clients trade a refresh token for a new access token at
+/auth/refresh, which costs an HMAC and one indexed lookup instead of the
+bcrypt verification of a password login. Tokens are random strings stored as
+HMAC-SHA256 digests, so a leaked table cannot be replayed.
+
+Every refresh rotates the token: the presented token is marked used and a new
+one of the same family is issued. A used token presented again means that it
+was copied, by the client or by a thief, and the whole family is revoked.
+Used tokens are only kept for the reuse detection window, revoked and expired
+tokens are purged in the background.
+"""
+
+import asyncio
+from datetime import timedelta
+import hashlib
+import hmac
+import logging
+import secrets
+from typing import Iterable, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_engine
+from entities.refresh_token import RefreshToken
+from entities.user import User
+from services import utils
+from services.exception import InvalidTokenError
+from services.metrics import registry
+from settings import REFRESH_TOKEN
+
+logger = logging.getLogger(__name__)
+
+refresh_requests = registry.counter(
+    "refresh_token_requests_total",
+    "Refresh token exchanges by result",
+    ("result",),
+)
+refresh_purge_failures = registry.counter(
+    "refresh_token_purge_failures_total",
+    "Failed purges of the expired refresh tokens",
+)
+
+def hash_token(token: str) -> str:
+    return hmac.new(REFRESH_TOKEN["SECRET"].encode(), token.encode(), hashlib.sha256).hexdigest()
+
+async def issue_refresh_token(user_id: UUID, db: AsyncSession, family_id: UUID = None) -> str:
+    """Store a new token of the family, a new family when none is given. The caller commits."""
+    token = secrets.token_urlsafe(32)
+    now = utils.get_current_utc_time()
+
+    await db.execute(insert(RefreshToken).values(
+        id=uuid4(),
+        token_hash=hash_token(token),
+        family_id=family_id or uuid4(),
+        user_id=user_id,
+        expires_at=now + timedelta(days=REFRESH_TOKEN["TTL_DAYS"]),
+        created_at=now,
+        updated_at=now,
+    ))
+
+    return token
+
+async def rotate_refresh_token(token: str, db: AsyncSession) -> Tuple[User, str]:
+    """Mark the token used and issue the next token of its family
+
+    Returns the user the token belongs to and the new token. Unknown, expired,
+    revoked and used tokens are rejected, a used token also revokes its family.
+    """
+    token_hash = hash_token(token)
+    now = utils.get_current_utc_time()
+
+    # Checking and consuming the token in one statement, two concurrent
+    # refreshes with the same token cannot both succeed
+    used = (await db.execute(
+        update(RefreshToken)
+        .filter(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(used_at=now, updated_at=now, expires_at=now + timedelta(hours=REFRESH_TOKEN["REUSE_DETECTION_HOURS"]))
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+    )).first()
+
+    if used is None:
+        family_id = (await db.scalars(
+            select(RefreshToken.family_id).filter(RefreshToken.token_hash == token_hash, RefreshToken.used_at.is_not(None))
+        )).first()
+        if family_id is not None:
+            await revoke_families([family_id], db)
+            await db.commit()
+            logger.warning("Refresh token reused, revoked the token family %s", family_id)
+        refresh_requests.inc(result="reused" if family_id is not None else "invalid")
+        raise InvalidTokenError()
+
+    user = (await db.scalars(select(User).filter(User.id == used.user_id))).first()
+    new_token = await issue_refresh_token(used.user_id, db, used.family_id)
+    await db.commit()
+
+    refresh_requests.inc(result="rotated")
+    return user, new_token
+
+async def revoke_families(family_ids: Iterable[UUID], db: AsyncSession) -> None:
+    # Revoked tokens expire at once, so that the purge removes them
+    now = utils.get_current_utc_time()
+    await db.execute(
+        update(RefreshToken)
+        .filter(RefreshToken.family_id.in_(set(family_ids)), RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now, updated_at=now, expires_at=now)
+    )
+
+async def revoke_refresh_token(token: str, db: AsyncSession) -> None:
+    """Revoke the family of the token, ending the session. Unknown tokens are ignored."""
+    family_id = (await db.scalars(select(RefreshToken.family_id).filter(RefreshToken.token_hash == hash_token(token)))).first()
+    if family_id is not None:
+        await revoke_families([family_id], db)
+        await db.commit()
+
+async def revoke_user_refresh_tokens(user_ids: Iterable[UUID], db: AsyncSession) -> None:
+    """Revoke every session of the users. The caller commits."""
+    now = utils.get_current_utc_time()
+    await db.execute(
+        update(RefreshToken)
+        .filter(RefreshToken.user_id.in_(set(user_ids)), RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now, updated_at=now, expires_at=now)
+    )
+
+
+class RefreshTokenPurger:
+    def __init__(self, interval: int) -> None:
+        self.interval = interval
+        self._background: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._background = asyncio.create_task(self._purge_periodically())
+
+    async def stop(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+
+    async def purge(self) -> int:
+        """Delete the expired tokens, used and revoked tokens included"""
+        async with async_engine.begin() as conn:
+            result = await conn.execute(delete(RefreshToken).filter(RefreshToken.expires_at <= utils.get_current_utc_time()))
+        return result.rowcount
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.purge()
+            except Exception as err:
+                refresh_purge_failures.inc()
+                logger.warning("Cannot purge the expired refresh tokens: %s", err)
+
+refresh_token_purger = RefreshTokenPurger(REFRESH_TOKEN["PURGE_INTERVAL"])
@@ -0,0 +1,82 @@
+"""Fast serialization of list endpoint pages
+
+List pages are selected as plain row tuples holding only the view model
+columns, validated in one batch by a cached TypeAdapter and encoded straight to
+JSON bytes, skipping the per-object validation and the jsonable_encoder /
+json.dumps round trip of the default response path. The optional `orjson`
+package is used for the encoding when installed, pydantic-core otherwise.
+"""
+
+from functools import cache
+from typing import FrozenSet, Sequence, Type
+
+from fastapi import Response, status
+from pydantic import BaseModel, ConfigDict, create_model, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Always selected, they are needed for the pagination cursor and the ETag
+KEY_FIELDS = ("id", "created_at", "updated_at")
+
+
+class JSONBytesResponse(Response):
+    """Response whose content is JSON already encoded to bytes"""
+    media_type = "application/json"
+
+
+@cache
+def get_adapter(type_) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+@cache
+def get_partial_model(view_model: Type[BaseModel], fields: FrozenSet[str] | None) -> Type[BaseModel]:
+    """View model restricted to the requested fields, created once per field set"""
+    if fields is None:
+        return view_model
+    return create_model(
+        f"Partial{view_model.__name__}",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (field.annotation, field) for name, field in view_model.model_fields.items() if name in fields},
+    )
+
+
+def get_view_columns(entity, view_model: Type[BaseModel], fields: FrozenSet[str] | None = None) -> list:
+    """The entity columns backing the requested fields of a view model and the key fields, in field order"""
+    return [
+        getattr(entity, name) for name in view_model.model_fields
+        if fields is None or name in fields or name in KEY_FIELDS
+    ]
+
+
+def encode(adapter: TypeAdapter, value, **options) -> bytes:
+    # orjson encodes the UUID, datetime and enum values of python mode dumps natively
+    if orjson is not None:
+        return orjson.dumps(adapter.dump_python(value, **options))
+    return adapter.dump_json(value, **options)
+
+
+def bytes_response(content: bytes, response: Response) -> JSONBytesResponse:
+    """Response for encoded content, keeping the headers already set on `response`"""
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return JSONBytesResponse(content, status_code=status.HTTP_200_OK, headers=headers)
+
+
+def list_response(view_model: Type[BaseModel], rows: Sequence, response: Response, fields: FrozenSet[str] | None = None) -> JSONBytesResponse:
+    """Serialize rows holding the view model columns, limited to the requested fields"""
+    adapter = get_adapter(list[get_partial_model(view_model, fields)])
+    return bytes_response(encode(adapter, adapter.validate_python(rows, from_attributes=True)), response)
+
+
+def view_response(view_model: Type[BaseModel], views: BaseModel | list, response: Response, fields: FrozenSet[str] | None = None) -> JSONBytesResponse:
+    """Serialize include views, limited to the requested fields and the included relationships"""
+    include = fields | set(view_model.relations) if fields is not None else None
+    if isinstance(views, list):
+        adapter = get_adapter(list[view_model])
+        include = {"__all__": include} if include is not None else None
+    else:
+        adapter = get_adapter(view_model)
+    return bytes_response(encode(adapter, views, include=include, exclude_unset=True), response)
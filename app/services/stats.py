@@ -0,0 +1,126 @@
+"""Aggregate statistics
+
+Per-company user and task counters are precomputed in the company_stats
+materialized view, so the statistics endpoints read one row per company
+instead of scanning the users and tasks tables. The view is refreshed
+concurrently in the background, readers are never blocked by a refresh and
+see counters at most one refresh interval old.
+"""
+
+import asyncio
+import logging
+import time
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_engine
+from entities.company_stats import company_stats
+from entities.task import TaskStatus
+from models.stats import CompanyStatsViewModel, TaskStatsViewModel
+from services.metrics import registry
+from settings import STATS_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held while refreshing, so that only one of several API
+# processes refreshes the view at a time
+REFRESH_LOCK_ID = 0x636f7374
+
+STATUS_COLUMNS = {status: company_stats.c[f"{status.value.lower()}_task_count"] for status in TaskStatus}
+
+refresh_duration = registry.histogram(
+    "stats_refresh_duration_seconds",
+    "Duration of the company_stats materialized view refreshes",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+refresh_failures = registry.counter(
+    "stats_refresh_failures_total",
+    "Failed company_stats materialized view refreshes",
+)
+
+def get_task_stats_values(row) -> dict:
+    return {
+        "task_count": row["task_count"],
+        "tasks_by_status": {status: row[column.name] for status, column in STATUS_COLUMNS.items()},
+        "average_priority": row["priority_sum"] / row["task_count"] if row["task_count"] else None,
+        "refreshed_at": row["refreshed_at"],
+    }
+
+async def get_company_stats(company_id: UUID, db: AsyncSession) -> CompanyStatsViewModel:
+    row = (await db.execute(select(company_stats).filter(company_stats.c.company_id == company_id))).mappings().first()
+    
+    # Companies created after the last refresh have no row yet
+    if row is None:
+        return CompanyStatsViewModel(
+            company_id=company_id,
+            user_count=0,
+            active_user_count=0,
+            admin_count=0,
+            task_count=0,
+            tasks_by_status={status: 0 for status in TaskStatus},
+        )
+    
+    return CompanyStatsViewModel(
+        company_id=company_id,
+        user_count=row["user_count"],
+        active_user_count=row["active_user_count"],
+        admin_count=row["admin_count"],
+        **get_task_stats_values(row),
+    )
+
+async def get_task_stats(db: AsyncSession) -> TaskStatsViewModel:
+    query = select(
+        func.coalesce(func.sum(company_stats.c.task_count), 0).label("task_count"),
+        *[func.coalesce(func.sum(column), 0).label(column.name) for column in STATUS_COLUMNS.values()],
+        func.coalesce(func.sum(company_stats.c.priority_sum), 0).label("priority_sum"),
+        func.min(company_stats.c.refreshed_at).label("refreshed_at"),
+    )
+    row = (await db.execute(query)).mappings().one()
+    
+    return TaskStatsViewModel(**get_task_stats_values(row))
+
+
+class StatsRefresher:
+    def __init__(self, interval: int) -> None:
+        self.interval = interval
+        self._background: asyncio.Task | None = None
+    
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._background = asyncio.create_task(self._refresh_periodically())
+    
+    async def stop(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+    
+    async def refresh(self) -> bool:
+        """Refresh the view unless another process is already refreshing it"""
+        async with async_engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if not (await conn.execute(select(func.pg_try_advisory_lock(REFRESH_LOCK_ID)))).scalar():
+                return False
+            try:
+                await conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY company_stats"))
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(REFRESH_LOCK_ID)))
+        return True
+    
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            started = time.perf_counter()
+            try:
+                if await self.refresh():
+                    refresh_duration.observe(time.perf_counter() - started)
+            except Exception as err:
+                refresh_failures.inc()
+                logger.warning("Cannot refresh the company_stats view: %s", err)
+
+stats_refresher = StatsRefresher(STATS_REFRESH_INTERVAL)
@@ -1,55 +1,115 @@
-from uuid import UUID
-from typing import List
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from uuid import UUID, uuid4
+from typing import FrozenSet, List, Set, Tuple
+from sqlalchemy import delete, insert, Row, Select, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from entities.task import Task
-from models.task import CreateTaskModel, SearchTaskModel, UpdateTaskModel
+from entities.user import User
+from models.bulk import BulkItemError
+from models.include import TaskInclude
+from models.task import BulkUpdateTaskModel, CreateTaskModel, SearchTaskModel, TaskViewModel, UpdateTaskModel
 from services import utils
-from services import user as UserService
+from services.cache import backend, EntityCache
+from services import conditional
+from services import serialization
 from services.exception import ResourceNotFoundError, InvalidInputError
 
-def get_all_tasks(conds: SearchTaskModel, db: Session) -> List[Task]:
+cache = EntityCache("task", TaskViewModel, backend)
+
+# Loader options of the ?include= paths, each related table is read in one extra query at most
+INCLUDE_OPTIONS = {
+    TaskInclude.USER.value: joinedload(Task.user),
+    TaskInclude.COMPANY.value: joinedload(Task.user).joinedload(User.company),
+}
+
+def build_search_query(conds: SearchTaskModel) -> Select:
     query = select(Task)
     
     if conds.summary is not None:
-        query = query.filter(Task.summary.like(f"{conds.summary}%"))
+        query = query.filter(utils.text_filter(Task.summary, conds.summary, conds.search_mode))
     if conds.description is not None:
-        query = query.filter(Task.description.like(f"{conds.description}%"))
+        query = query.filter(utils.text_filter(Task.description, conds.description, conds.search_mode))
     if conds.status is not None:
         query = query.filter(Task.status == conds.status)
     query = query.filter(Task.priority >= conds.priority)
     
-    query = query.offset((conds.page-1)*conds.size).limit(conds.size)
+    return query
+
+async def get_all_tasks(conds: SearchTaskModel, db: AsyncSession, include: Set[str] = frozenset()) -> List[Task]:
+    query = utils.paginate(build_search_query(conds), Task, conds)
+    query = query.options(*[INCLUDE_OPTIONS[path] for path in include])
     
-    return db.scalars(query).all()
+    return (await db.scalars(query)).all()
 
-def get_task_by_id(task_id: UUID, db: Session) -> Task:
-    return db.scalars(select(Task).filter(Task.id == task_id)).first()
+async def get_all_tasks_rows(conds: SearchTaskModel, db: AsyncSession, fields: FrozenSet[str] = None) -> List[Row]:
+    """Same page as get_all_tasks, as row tuples holding only the requested TaskViewModel columns"""
+    query = build_search_query(conds).with_only_columns(*serialization.get_view_columns(Task, TaskViewModel, fields))
+    query = utils.paginate(query, Task, conds)
+    
+    return (await db.execute(query)).all()
 
-def create_task(data: CreateTaskModel, db: Session) -> Task:
-    user = UserService.get_user_by_id(data.user_id, db)
+def get_export_query(conds: SearchTaskModel) -> Select:
+    return build_search_query(conds).order_by(Task.created_at, Task.id)
+
+async def get_task_by_id(task_id: UUID, db: AsyncSession, include: Set[str] = frozenset()) -> TaskViewModel | Task:
+    # Related rows are not cached, views including them are read from the database
+    if include:
+        query = select(Task).filter(Task.id == task_id).options(*[INCLUDE_OPTIONS[path] for path in include])
+        return (await db.scalars(query)).first()
     
-    if user is None:
-        raise InvalidInputError("Invalid user information")
+    task = await cache.get(task_id)
+    
+    if task is None:
+        entity = await get_task_entity_by_id(task_id, db)
+        if entity is None:
+            return None
+        task = TaskViewModel.model_validate(entity)
+        await cache.put(task_id, task, db)
     
-    task = Task(**data.model_dump())
+    return task
+
+async def get_task_entity_by_id(task_id: UUID, db: AsyncSession, for_update: bool = False) -> Task:
+    query = select(Task).filter(Task.id == task_id)
+    if for_update:
+        query = query.with_for_update()
+    return (await db.scalars(query)).first()
+
+async def create_task(data: CreateTaskModel, db: AsyncSession) -> Task:
+    values = data.model_dump()
+    values["created_at"] = utils.get_current_utc_time()
+    values["updated_at"] = utils.get_current_utc_time()
     
-    task.created_at = utils.get_current_utc_time()
-    task.updated_at = utils.get_current_utc_time()
+    # The tasks.user_id foreign key checks the user, no need to load it first
+    try:
+        task = (await db.scalars(insert(Task).values(**values).returning(Task))).one()
+    except IntegrityError:
+        raise InvalidInputError("Invalid user information")
     
-    db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
     
     return task
 
-def update_task_by_id(task_id: UUID, data: UpdateTaskModel, db: Session) -> Task:
-    task = get_task_by_id(task_id, db)
+async def update_task_by_id(task_id: UUID, data: UpdateTaskModel, db: AsyncSession, if_match: str = None) -> Task:
+    if if_match is not None:
+        # Only conditional updates read the row first, it stays locked until the update
+        task = await get_task_entity_by_id(task_id, db, for_update=True)
+        if task is None:
+            raise ResourceNotFoundError()
+        conditional.check_if_match(if_match, task.id, task.updated_at)
+    
+    task = await utils.update_by_id(Task, task_id, data.model_dump(exclude_none=True), db)
     
     if task is None:
         raise ResourceNotFoundError()
     
+    await db.commit()
+    await cache.invalidate([task_id])
+    
+    return task
+
+def apply_update(task: Task, data: UpdateTaskModel) -> None:
     updated = False
     if data.summary is not None:
         task.summary = data.summary
@@ -65,17 +125,64 @@ def update_task_by_id(task_id: UUID, data: UpdateTaskModel, db: Session) -> Task
         updated = True
     if updated:
         task.updated_at = utils.get_current_utc_time()
+
+async def delete_task_by_id(task_id: UUID, db: AsyncSession) -> None:
+    if not await utils.delete_by_id(Task, task_id, db):
+        raise ResourceNotFoundError()
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await cache.invalidate([task_id])
+
+async def create_tasks(items: List[CreateTaskModel], db: AsyncSession) -> Tuple[List[Task], List[BulkItemError]]:
+    user_ids = set((await db.scalars(select(User.id).filter(User.id.in_({item.user_id for item in items})))).all())
     
-    return task
+    values = []
+    errors = []
+    for index, item in enumerate(items):
+        if item.user_id not in user_ids:
+            errors.append(BulkItemError(index=index, detail="Invalid user information"))
+            continue
+        values.append({
+            **item.model_dump(),
+            "id": uuid4(),
+            "created_at": utils.get_current_utc_time(),
+            "updated_at": utils.get_current_utc_time(),
+        })
+    
+    if not values:
+        return [], errors
+    
+    # A single multi-row INSERT ... RETURNING per batch of rows
+    tasks = (await db.scalars(insert(Task).returning(Task, sort_by_parameter_order=True), values)).all()
+    await db.commit()
+    
+    return tasks, errors
 
-def delete_task_by_id(task_id: UUID, db: Session) -> None:
-    task = get_task_by_id(task_id, db)
+async def update_tasks(items: List[BulkUpdateTaskModel], db: AsyncSession) -> Tuple[List[Task], List[BulkItemError]]:
+    tasks = {task.id: task for task in (await db.scalars(select(Task).filter(Task.id.in_({item.id for item in items})))).all()}
     
-    if task is None:
-        raise ResourceNotFoundError()
+    updated = []
+    errors = []
+    for index, item in enumerate(items):
+        task = tasks.get(item.id)
+        if task is None:
+            errors.append(BulkItemError(index=index, id=item.id, detail="Resource not found"))
+            continue
+        apply_update(task, item)
+        updated.append(task)
+    
+    await db.commit()
+    await cache.invalidate([task.id for task in updated])
+    
+    return updated, errors
+
+async def delete_tasks(task_ids: List[UUID], db: AsyncSession) -> Tuple[List[UUID], List[BulkItemError]]:
+    deleted = set((await db.scalars(delete(Task).filter(Task.id.in_(set(task_ids))).returning(Task.id))).all())
+    await db.commit()
+    await cache.invalidate(deleted)
     
-    db.delete(task)
-    db.commit()
\ No newline at end of file
+    errors = [
+        BulkItemError(index=index, id=task_id, detail="Resource not found")
+        for index, task_id in enumerate(task_ids) if task_id not in deleted
+    ]
+    return [task_id for task_id in task_ids if task_id in deleted], errors
\ No newline at end of file
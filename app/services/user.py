@@ -1,79 +1,228 @@
-from uuid import UUID
-from typing import List
-from sqlalchemy import select, and_
-from sqlalchemy.orm import Session
+from datetime import timedelta
+from uuid import UUID, uuid4
+from typing import FrozenSet, List, Set, Tuple
+from sqlalchemy import bindparam, delete, insert, Row, or_, Select, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
-from entities.user import User, get_password_hash
-from models.user import CreateUserModel, SearchUserModel, UpdateUserModel
+from entities.company import Company
+from entities.task import Task
+from entities.user import PENDING_PASSWORD_HASH, User
+from models.bulk import BulkItemError
+from models.include import UserInclude
+from models.user import BulkUpdateUserModel, CreateUserModel, SearchUserModel, UpdateUserModel, UserViewModel
 from services import utils
+from services.cache import backend, EntityCache
+from services import conditional
+from services import serialization
 from services import company as CompanyService
-from services.exception import ResourceNotFoundError, InvalidInputError
+from services import jobs
+from services import refresh_token as RefreshTokenService
+from services.exception import ResourceNotFoundError, InvalidInputError, ServiceUnavailableError
+from services.metrics import registry
+from services.password import password_hasher
+from settings import JOB_QUEUE
 
-def get_all_users(conds: SearchUserModel, db: Session) -> List[User]:
+USERNAME_ALLOCATION_ATTEMPTS = 10
+HASH_DEFAULT_PASSWORDS_JOB = "user.hash_default_passwords"
+HASH_DEFAULT_PASSWORDS_BATCH_SIZE = 100
+PENDING_PASSWORD_SWEEP_LIMIT = 10000
+
+cache = EntityCache("user", UserViewModel, backend)
+
+# Loader options of the ?include= paths, each related table is read in one extra query at most
+INCLUDE_OPTIONS = {
+    UserInclude.COMPANY.value: joinedload(User.company),
+    UserInclude.TASKS.value: selectinload(User.tasks),
+}
+
+username_conflicts = registry.counter(
+    "user_username_conflicts_total",
+    "User creations that lost a username race and allocated again",
+)
+
+def build_search_query(conds: SearchUserModel) -> Select:
     query = select(User)
     
     if conds.email is not None:
-        query = query.filter(User.email.like(f"{conds.email}%"))
+        query = query.filter(utils.text_filter(User.email, conds.email, conds.search_mode))
     if conds.username is not None:
-        query = query.filter(User.username.like(f"{conds.username}%"))
+        query = query.filter(utils.text_filter(User.username, conds.username, conds.search_mode))
     if conds.first_name is not None:
-        query = query.filter(User.first_name.like(f"{conds.first_name}%"))
+        query = query.filter(utils.text_filter(User.first_name, conds.first_name, conds.search_mode))
     if conds.last_name is not None:
-        query = query.filter(User.last_name.like(f"{conds.last_name}%"))
+        query = query.filter(utils.text_filter(User.last_name, conds.last_name, conds.search_mode))
     if conds.is_active is not None:
         query = query.filter(User.is_active == conds.is_active)
     if conds.is_admin is not None:
         query = query.filter(User.is_admin == conds.is_admin)
     
-    query = query.offset((conds.page-1)*conds.size).limit(conds.size)
+    return query
+
+async def get_all_users(conds: SearchUserModel, db: AsyncSession, include: Set[str] = frozenset()) -> List[User]:
+    query = utils.paginate(build_search_query(conds), User, conds)
+    query = query.options(*[INCLUDE_OPTIONS[path] for path in include])
     
-    return db.scalars(query).all()
+    return (await db.scalars(query)).all()
 
-def get_user_by_id(user_id: UUID, db: Session) -> User:
-    return db.scalars(select(User).filter(User.id == user_id)).first()
+async def get_all_users_rows(conds: SearchUserModel, db: AsyncSession, fields: FrozenSet[str] = None) -> List[Row]:
+    """Same page as get_all_users, as row tuples holding only the requested UserViewModel columns"""
+    query = build_search_query(conds).with_only_columns(*serialization.get_view_columns(User, UserViewModel, fields))
+    query = utils.paginate(query, User, conds)
+    
+    return (await db.execute(query)).all()
 
-def get_user_by_company_id_and_username(company_id: UUID, username: str, db: Session) -> User:
-    return db.scalars(select(User).filter(and_(User.company_id == company_id, User.username == username))).first()
+def get_export_query(conds: SearchUserModel) -> Select:
+    return build_search_query(conds).order_by(User.created_at, User.id)
 
-def create_user(data: CreateUserModel, db: Session) -> User:
-    company = CompanyService.get_company_by_id(data.company_id, db)
+async def get_user_by_id(user_id: UUID, db: AsyncSession, include: Set[str] = frozenset()) -> UserViewModel | User:
+    # Related rows are not cached, views including them are read from the database
+    if include:
+        query = select(User).filter(User.id == user_id).options(*[INCLUDE_OPTIONS[path] for path in include])
+        return (await db.scalars(query)).first()
     
-    if company is None:
-        raise InvalidInputError("Invalid company information")
+    user = await cache.get(user_id)
     
-    user = User(**data.model_dump())
+    if user is None:
+        entity = await get_user_entity_by_id(user_id, db)
+        if entity is None:
+            return None
+        user = UserViewModel.model_validate(entity)
+        await cache.put(user_id, user, db)
     
-    # Generate unique username based on first and last name
-    user.username = f"{user.first_name}.{user.last_name}"
-    user.username = format(user.username)
+    return user
+
+async def get_user_entity_by_id(user_id: UUID, db: AsyncSession, for_update: bool = False) -> User:
+    query = select(User).filter(User.id == user_id)
+    if for_update:
+        query = query.with_for_update()
+    return (await db.scalars(query)).first()
+
+async def get_taken_usernames(bases: Set[str], db: AsyncSession) -> Set[str]:
+    """Fetch every existing username starting with one of the bases in a single query"""
+    query = select(User.username).filter(or_(*[User.username.startswith(base, autoescape=True) for base in bases]))
+    return set((await db.scalars(query)).all())
+
+def next_free_username(base: str, taken: Set[str]) -> str:
+    username = base
     salt = 1
-    while get_user_by_company_id_and_username(user.company_id, user.username, db) is not None:
-        user.username = f"{user.first_name}.{user.last_name}{salt}"
-        user.username = format(user.username)
+    while username in taken:
+        username = f"{base}{salt}"
         salt += 1
-    user.username = format(user.username)
-    user.email= f"{user.username}@{company.name}.com"
-    user.email = format(user.email)
-    user.hashed_password = get_password_hash(f"{user.username}@password")
+    return username
+
+async def allocate_username(first_name: str, last_name: str, db: AsyncSession) -> str:
+    """Pick the first free "first.last", "first.last1", ... username with a single query"""
+    base = format(f"{first_name}.{last_name}")
+    return next_free_username(base, await get_taken_usernames({base}, db))
+
+@jobs.handler(HASH_DEFAULT_PASSWORDS_JOB)
+async def hash_default_passwords(payload: dict, db: AsyncSession) -> None:
+    """Replace the pending password hash of new users with the hash of their "username@password" default password
+    
+    Users whose password was set in the meantime are left untouched.
+    """
+    query = select(User.id, User.username).filter(User.id.in_([UUID(id) for id in payload["user_ids"]]), User.hashed_password == PENDING_PASSWORD_HASH)
+    users = (await db.execute(query)).all()
+    if not users:
+        return
+    
+    hashes = await password_hasher.hash_many([f"{user.username}@password" for user in users])
+    
+    table = User.__table__
+    await db.execute(
+        update(table)
+        .where(table.c.id == bindparam("user_id"), table.c.hashed_password == PENDING_PASSWORD_HASH)
+        .values(hashed_password=bindparam("hashed_password")),
+        [{"user_id": user.id, "hashed_password": hashed_password} for user, hashed_password in zip(users, hashes)],
+    )
+
+@jobs.sweeper
+async def enqueue_pending_passwords(db: AsyncSession) -> None:
+    """Enqueue again the default password hashing of users still pending after a sweep interval
+    
+    Their job was lost with the process that held it or ran out of attempts.
+    Younger users are left to the job enqueued by their creation.
+    """
+    created_before = utils.get_current_utc_time() - timedelta(seconds=JOB_QUEUE["SWEEP_INTERVAL"])
+    query = (
+        select(User.id)
+        .filter(User.hashed_password == PENDING_PASSWORD_HASH, User.created_at < created_before)
+        .limit(PENDING_PASSWORD_SWEEP_LIMIT)
+    )
+    user_ids = [str(user_id) for user_id in (await db.scalars(query)).all()]
+    
+    for start in range(0, len(user_ids), HASH_DEFAULT_PASSWORDS_BATCH_SIZE):
+        await jobs.enqueue(HASH_DEFAULT_PASSWORDS_JOB, {"user_ids": user_ids[start:start + HASH_DEFAULT_PASSWORDS_BATCH_SIZE]}, db)
+
+async def create_user(data: CreateUserModel, db: AsyncSession) -> User:
+    company = await CompanyService.get_company_by_id(data.company_id, db)
+    
+    if company is None:
+        raise InvalidInputError("Invalid company information")
+    
+    user = User(**data.model_dump())
     
     user.created_at = utils.get_current_utc_time()
     user.updated_at = utils.get_current_utc_time()
     
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # A concurrent create may claim the allocated username first. The insert
+    # runs in a savepoint, so losing that race only rolls back the savepoint
+    # and the username is allocated again.
+    for _ in range(USERNAME_ALLOCATION_ATTEMPTS):
+        user.username = await allocate_username(user.first_name, user.last_name, db)
+        user.email = format(f"{user.username}@{company.name}.com")
+        user.hashed_password = PENDING_PASSWORD_HASH
+        try:
+            async with db.begin_nested():
+                db.add(user)
+            break
+        except IntegrityError:
+            username_conflicts.inc()
+    else:
+        raise ServiceUnavailableError("Could not allocate a unique username, please retry later")
+    
+    await jobs.enqueue(HASH_DEFAULT_PASSWORDS_JOB, {"user_ids": [str(user.id)]}, db)
+    await db.commit()
     
     return user
 
-def update_user_by_id(user_id: UUID, data: UpdateUserModel, db: Session) -> User:
-    user = get_user_by_id(user_id, db)
+async def update_user_by_id(user_id: UUID, data: UpdateUserModel, db: AsyncSession, if_match: str = None) -> User:
+    hashed_password = await password_hasher.hash(data.password) if data.password is not None else None
+    
+    if if_match is not None:
+        # Only conditional updates read the row first, it stays locked until the update
+        user = await get_user_entity_by_id(user_id, db, for_update=True)
+        if user is None:
+            raise ResourceNotFoundError()
+        conditional.check_if_match(if_match, user.id, user.updated_at)
+    
+    values = data.model_dump(exclude_none=True, exclude={"password"})
+    if hashed_password is not None:
+        values["hashed_password"] = hashed_password
+    
+    user = await utils.update_by_id(User, user_id, values, db)
     
     if user is None:
         raise ResourceNotFoundError()
     
+    if ends_sessions(data):
+        await RefreshTokenService.revoke_user_refresh_tokens([user_id], db)
+    
+    await db.commit()
+    await cache.invalidate([user_id])
+    
+    return user
+
+def ends_sessions(data: UpdateUserModel) -> bool:
+    # A new password or a deactivation revokes the refresh tokens of the user
+    return data.password is not None or data.is_active is False
+
+def apply_update(user: User, data: UpdateUserModel, hashed_password: str = None) -> None:
     updated = False
-    if data.password is not None:
-        user.hashed_password = get_password_hash(data.password)
+    if hashed_password is not None:
+        user.hashed_password = hashed_password
         updated = True
     if data.is_active is not None:
         user.is_active = data.is_active
@@ -83,20 +232,116 @@ def update_user_by_id(user_id: UUID, data: UpdateUserModel, db: Session) -> User
         updated = True
     if updated:
         user.updated_at = utils.get_current_utc_time()
+
+async def delete_user_by_id(user_id: UUID, db: AsyncSession) -> None:
+    try:
+        deleted = await utils.delete_by_id(User, user_id, db)
+    except IntegrityError:
+        raise InvalidInputError("User still has tasks")
     
-    db.commit()
-    db.refresh(user)
+    if not deleted:
+        raise ResourceNotFoundError()
     
-    return user
+    await db.commit()
+    await cache.invalidate([user_id])
 
-def delete_user_by_id(user_id: UUID, db: Session) -> None:
-    user = get_user_by_id(user_id, db)
+async def create_users(items: List[CreateUserModel], db: AsyncSession) -> Tuple[List[User], List[BulkItemError]]:
+    companies = {company.id: company for company in (await db.scalars(select(Company).filter(Company.id.in_({item.company_id for item in items})))).all()}
     
-    if user is None:
-        raise ResourceNotFoundError()
+    valid = []
+    errors = []
+    for index, item in enumerate(items):
+        if item.company_id not in companies:
+            errors.append(BulkItemError(index=index, detail="Invalid company information"))
+            continue
+        valid.append(item)
+    
+    if not valid:
+        return [], errors
+    
+    # Same strategy as create_user: on a username race only the savepoint is
+    # rolled back and the whole batch is allocated again.
+    for _ in range(USERNAME_ALLOCATION_ATTEMPTS):
+        taken = await get_taken_usernames({format(f"{item.first_name}.{item.last_name}") for item in valid}, db)
+        
+        values = []
+        for item in valid:
+            username = next_free_username(format(f"{item.first_name}.{item.last_name}"), taken)
+            taken.add(username)
+            values.append({
+                **item.model_dump(),
+                "id": uuid4(),
+                "username": username,
+                "email": format(f"{username}@{companies[item.company_id].name}.com"),
+                "hashed_password": PENDING_PASSWORD_HASH,
+                "created_at": utils.get_current_utc_time(),
+                "updated_at": utils.get_current_utc_time(),
+            })
+        
+        try:
+            async with db.begin_nested():
+                users = (await db.scalars(insert(User).returning(User, sort_by_parameter_order=True), values)).all()
+            break
+        except IntegrityError:
+            username_conflicts.inc()
+    else:
+        raise ServiceUnavailableError("Could not allocate unique usernames, please retry later")
+    
+    await jobs.enqueue(HASH_DEFAULT_PASSWORDS_JOB, {"user_ids": [str(user.id) for user in users]}, db)
+    await db.commit()
+    
+    return users, errors
+
+async def update_users(items: List[BulkUpdateUserModel], db: AsyncSession) -> Tuple[List[User], List[BulkItemError]]:
+    users = {user.id: user for user in (await db.scalars(select(User).filter(User.id.in_({item.id for item in items})))).all()}
+    
+    passwords = [item.password for item in items if item.id in users and item.password is not None]
+    hashes = dict(zip(passwords, await password_hasher.hash_many(passwords)))
+    
+    updated = []
+    errors = []
+    for index, item in enumerate(items):
+        user = users.get(item.id)
+        if user is None:
+            errors.append(BulkItemError(index=index, id=item.id, detail="Resource not found"))
+            continue
+        apply_update(user, item, hashes.get(item.password))
+        updated.append(user)
+    
+    ended = [item.id for item in items if item.id in users and ends_sessions(item)]
+    if ended:
+        await RefreshTokenService.revoke_user_refresh_tokens(ended, db)
+    
+    await db.commit()
+    await cache.invalidate([user.id for user in updated])
+    
+    return updated, errors
+
+async def delete_users(user_ids: List[UUID], db: AsyncSession) -> Tuple[List[UUID], List[BulkItemError]]:
+    # Users that still have tasks cannot be deleted without breaking the
+    # tasks.user_id foreign key, so they are reported instead of failing the batch.
+    # The users are locked first: a concurrent task insert then waits for this
+    # transaction, so the check cannot miss its task.
+    await db.execute(select(User.id).filter(User.id.in_(set(user_ids))).order_by(User.id).with_for_update())
+    referenced = set((await db.scalars(select(Task.user_id).filter(Task.user_id.in_(set(user_ids))).distinct())).all())
+    
+    deletable = set(user_ids) - referenced
+    deleted = set()
+    if deletable:
+        try:
+            deleted = set((await db.scalars(delete(User).filter(User.id.in_(deletable)).returning(User.id))).all())
+        except IntegrityError:
+            raise InvalidInputError("User still has tasks")
+        await db.commit()
+        await cache.invalidate(deleted)
     
-    db.delete(user)
-    db.commit()
+    errors = []
+    for index, user_id in enumerate(user_ids):
+        if user_id in referenced:
+            errors.append(BulkItemError(index=index, id=user_id, detail="User still has tasks"))
+        elif user_id not in deleted:
+            errors.append(BulkItemError(index=index, id=user_id, detail="Resource not found"))
+    return [user_id for user_id in user_ids if user_id in deleted], errors
     
 def format(str) -> str:
     return str.replace(" ", "").lower()
\ No newline at end of file
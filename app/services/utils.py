@@ -1,8 +1,118 @@
+import base64
+import binascii
+import enum
+import json
 from datetime import datetime, timezone
+from typing import FrozenSet, Set, Type
+from uuid import UUID
 import time
 
+from sqlalchemy import ColumnElement, delete, Select, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from models.search import SearchMode
+from services.exception import InvalidInputError
+
 def get_current_utc_time() -> datetime:
-    return datetime.now(timezone.utc)
+    # Naive, like the `timestamp without time zone` columns, asyncpg rejects aware datetimes for them
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 def get_current_timestamp() -> int:
-    return int(time.time())
\ No newline at end of file
+    return int(time.time())
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    payload = json.dumps([created_at.isoformat(), str(id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidInputError("Invalid cursor")
+
+def text_filter(column, value: str, mode: SearchMode = SearchMode.PREFIX) -> ColumnElement[bool]:
+    """Build a text search predicate served by the column's search indexes
+
+    PREFIX matches are backed by text_pattern_ops B-tree indexes, CONTAINS
+    matches are case-insensitive and backed by pg_trgm GIN indexes.
+    """
+    if mode == SearchMode.CONTAINS:
+        return column.ilike(f"%{value}%")
+    return column.like(f"{value}%")
+
+def parse_include(value: str | None, include: Type[enum.Enum]) -> Set[str]:
+    """Parse a comma separated ?include= value, a nested path also includes its parents"""
+    if not value:
+        return set()
+    
+    paths = set()
+    for path in value.split(","):
+        path = path.strip()
+        try:
+            include(path)
+        except ValueError:
+            raise InvalidInputError(f"Invalid include: {path}")
+        parts = path.split(".")
+        paths.update(".".join(parts[:index + 1]) for index in range(len(parts)))
+    return paths
+
+def parse_fields(value: str | None, view_model) -> FrozenSet[str] | None:
+    """Parse a comma separated ?fields= value into a sparse fieldset, the ID is always part of it"""
+    if not value:
+        return None
+    
+    fields = {"id"}
+    for field in value.split(","):
+        field = field.strip()
+        if field not in view_model.model_fields or field in getattr(view_model, "relations", {}):
+            raise InvalidInputError(f"Invalid field: {field}")
+        fields.add(field)
+    return frozenset(fields)
+
+def paginate(query: Select, entity, conds) -> Select:
+    """Order the query on (created_at, id) and apply keyset or offset pagination
+
+    A cursor takes precedence over the page number, so that deep pages are
+    served from the (created_at, id) index instead of scanning every earlier row.
+    """
+    query = query.order_by(entity.created_at, entity.id)
+    
+    if conds.cursor is not None:
+        query = query.filter(tuple_(entity.created_at, entity.id) > decode_cursor(conds.cursor))
+    else:
+        query = query.offset((conds.page-1)*conds.size)
+    
+    return query.limit(conds.size)
+
+def get_next_cursor(items: list, size: int) -> str | None:
+    if len(items) < size:
+        return None
+    return encode_cursor(items[-1].created_at, items[-1].id)
+
+async def update_by_id(entity, id: UUID, values: dict, db: AsyncSession):
+    """Update a row in a single UPDATE ... RETURNING round trip
+
+    Returns the updated entity, or None when no row has the ID. Without
+    values to update, the row is only selected and updated_at is kept.
+    """
+    if not values:
+        query = select(entity).filter(entity.id == id)
+    else:
+        query = (
+            update(entity)
+            .filter(entity.id == id)
+            .values(**values, updated_at=get_current_utc_time())
+            .returning(entity)
+            # Deferred columns are returned too, otherwise the cached statement
+            # and the ORM row loader can disagree on the RETURNING column order
+            .options(undefer("*"))
+            .execution_options(populate_existing=True)
+        )
+    
+    return (await db.scalars(query)).first()
+
+async def delete_by_id(entity, id: UUID, db: AsyncSession) -> bool:
+    """Delete a row in a single DELETE ... RETURNING round trip, telling whether it existed"""
+    return (await db.scalars(delete(entity).filter(entity.id == id).returning(entity.id))).first() is not None
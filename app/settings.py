@@ -12,20 +12,41 @@ COGNITO = {
     "CLIENT_ID": os.environ.get("COGNITO_CLIENT_ID"),
     "CLIENT_SECRET": os.environ.get("COGNITO_CLIENT_SECRET"),
     "JWKS_URL": os.environ.get("COGNITO_JWKS_URL"),
+    "JWKS_REFRESH_INTERVAL": int(os.environ.get("COGNITO_JWKS_REFRESH_INTERVAL", 3600)),
+    "JWKS_MIN_REFRESH_INTERVAL": int(os.environ.get("COGNITO_JWKS_MIN_REFRESH_INTERVAL", 30)),
 }
 
 JWT_SECRET = os.environ.get("JWT_SECRET")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
+JWT_CLAIMS_CACHE_SIZE = int(os.environ.get("JWT_CLAIMS_CACHE_SIZE", 10000))
+
+# GET /metrics is only exposed when a scrape token is set, scrapers send it as a bearer token
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Refresh tokens are stored as HMAC digests keyed with their own secret, JWT_SECRET by default
+REFRESH_TOKEN = {
+    "SECRET": os.environ.get("REFRESH_TOKEN_SECRET") or JWT_SECRET,
+    "TTL_DAYS": int(os.environ.get("REFRESH_TOKEN_TTL_DAYS", 30)),
+    "REUSE_DETECTION_HOURS": int(os.environ.get("REFRESH_TOKEN_REUSE_DETECTION_HOURS", 24)),
+    "PURGE_INTERVAL": int(os.environ.get("REFRESH_TOKEN_PURGE_INTERVAL", 3600)),
+}
+
+# Password Hashing Setting
+PASSWORD_HASHING = {
+    "EXECUTOR": os.environ.get("PASSWORD_HASHING_EXECUTOR", "thread").lower(),
+    "WORKERS": int(os.environ.get("PASSWORD_HASHING_WORKERS", os.cpu_count() or 1)),
+    "MAX_QUEUE_SIZE": int(os.environ.get("PASSWORD_HASHING_MAX_QUEUE_SIZE", 32)),
+}
 
 # Database Setting
-def get_connection_string(asyncMode: bool = False) -> str:
+def get_connection_string(asyncMode: bool = False, dbhost: str = None) -> str:
     """Get the connection string for the database
 
     Returns:
         string: The connection string
     """
     engine = os.environ.get("POSTGRES_ENGINE") if not asyncMode else os.environ.get("ASYNC_POSTGRES_ENGINE")
-    dbhost = os.environ.get("POSTGRES_HOST")
+    dbhost = dbhost or os.environ.get("POSTGRES_HOST")
     username = os.environ.get("POSTGRES_USER")
     password = os.environ.get("POSTGRES_PASSWORD")
     dbname = os.environ.get("POSTGRES_DB")
@@ -34,6 +55,65 @@ def get_connection_string(asyncMode: bool = False) -> str:
 SQLALCHEMY_DATABASE_URL = get_connection_string()
 SQLALCHEMY_DATABASE_URL_ASYNC = get_connection_string(asyncMode=True)
 
+# Read replicas share the primary credentials, reads are spread across them
+# when POSTGRES_REPLICA_HOSTS is a comma separated list of hosts.
+SQLALCHEMY_DATABASE_REPLICA_URLS_ASYNC = [
+    get_connection_string(asyncMode=True, dbhost=host.strip())
+    for host in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()
+]
+
+DATABASE_POOL = {
+    "SIZE": int(os.environ.get("DB_POOL_SIZE", 5)),
+    "MAX_OVERFLOW": int(os.environ.get("DB_POOL_MAX_OVERFLOW", 10)),
+    "TIMEOUT": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    "RECYCLE": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    "PRE_PING": os.environ.get("DB_POOL_PRE_PING", "true").lower() == 'true',
+    "PGBOUNCER": os.environ.get("DB_PGBOUNCER", "").lower() == 'true',
+    "SYNC_ENGINE_ENABLED": os.environ.get("DB_SYNC_ENGINE_ENABLED", "").lower() == 'true',
+}
+
+
+# Entity Cache Setting
+ENTITY_CACHE = {
+    "BACKEND": os.environ.get("ENTITY_CACHE_BACKEND", "memory").lower(),
+    "URL": os.environ.get("ENTITY_CACHE_URL", "redis://localhost:6379/0"),
+    "TTL": int(os.environ.get("ENTITY_CACHE_TTL", 60)),
+    "MAX_SIZE": int(os.environ.get("ENTITY_CACHE_MAX_SIZE", 10000)),
+}
+
+
+# Login Rate Limit Setting, a PER_MINUTE of 0 disables its limiter
+LOGIN_RATE_LIMIT = {
+    "BACKEND": os.environ.get("LOGIN_RATE_LIMIT_BACKEND", "memory").lower(),
+    "URL": os.environ.get("LOGIN_RATE_LIMIT_URL", "redis://localhost:6379/0"),
+    "MAX_KEYS": int(os.environ.get("LOGIN_RATE_LIMIT_MAX_KEYS", 100000)),
+    "IP_CAPACITY": int(os.environ.get("LOGIN_RATE_LIMIT_IP_CAPACITY", 20)),
+    "IP_PER_MINUTE": float(os.environ.get("LOGIN_RATE_LIMIT_IP_PER_MINUTE", 10)),
+    "USERNAME_CAPACITY": int(os.environ.get("LOGIN_RATE_LIMIT_USERNAME_CAPACITY", 5)),
+    "USERNAME_PER_MINUTE": float(os.environ.get("LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE", 1)),
+}
+
+
+# Background Job Setting
+JOB_QUEUE = {
+    "BACKEND": os.environ.get("JOB_QUEUE_BACKEND", "memory").lower(),
+    "WORKERS": int(os.environ.get("JOB_QUEUE_WORKERS", 2)),
+    "MAX_SIZE": int(os.environ.get("JOB_QUEUE_MAX_SIZE", 10000)),
+    "MAX_ATTEMPTS": int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", 5)),
+    "RETRY_DELAY": float(os.environ.get("JOB_QUEUE_RETRY_DELAY", 1)),
+    "POLL_INTERVAL": float(os.environ.get("JOB_QUEUE_POLL_INTERVAL", 1)),
+    "DRAIN_TIMEOUT": float(os.environ.get("JOB_QUEUE_DRAIN_TIMEOUT", 30)),
+    "SWEEP_INTERVAL": int(os.environ.get("JOB_QUEUE_SWEEP_INTERVAL", 60)),
+}
+
+
+# Statistics Setting
+STATS_REFRESH_INTERVAL = int(os.environ.get("STATS_REFRESH_INTERVAL", 60))
+
+
+# Monitoring Setting
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+
 
 # Other Settings
 ADMIN_DEFAULT_PASSWORD = os.environ.get("DEFAULT_PASSWORD")
@@ -0,0 +1,116 @@
+"""Test configuration
+
+The application runs against a throwaway SQLite database. The settings are
+read from the environment at import time, so the database URLs are set before
+any application module is imported.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+os.environ.setdefault("POSTGRES_ENGINE", "sqlite")
+os.environ.setdefault("ASYNC_POSTGRES_ENGINE", "sqlite+aiosqlite")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("METRICS_TOKEN", "test-metrics-token")
+# Background sweeps would add their own queries to the counted ones
+os.environ.setdefault("JOB_QUEUE_SWEEP_INTERVAL", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "test.sqlite")
+settings.SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+settings.SQLALCHEMY_DATABASE_URL_ASYNC = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+from fastapi.testclient import TestClient
+
+import database
+from entities.company import Company, CompanyMode
+from entities.task import Task, TaskStatus
+from entities.user import User
+from main import app
+from services import auth as AuthService
+from services import utils
+
+COMPANIES = 3
+USERS_PER_COMPANY = 3
+TASKS_PER_USER = 2
+
+
+async def seed() -> User:
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(database.metadata.drop_all)
+        await conn.run_sync(database.metadata.create_all)
+    
+    now = utils.get_current_utc_time()
+    async with database.AsyncSessionLocal() as db:
+        admin = None
+        for company_index in range(COMPANIES):
+            company = Company(name=f"Company {company_index}", description="Test company", mode=CompanyMode.ESTABLISHED, rating=3, created_at=now, updated_at=now)
+            db.add(company)
+            for user_index in range(USERS_PER_COMPANY):
+                username = f"user.{company_index}.{user_index}"
+                user = User(
+                    email=f"{username}@example.com", username=username, first_name="Test", last_name="User",
+                    hashed_password="-", is_active=True, is_admin=True, company=company, created_at=now, updated_at=now,
+                )
+                db.add(user)
+                admin = admin or user
+                for task_index in range(TASKS_PER_USER):
+                    db.add(Task(summary=f"Task {task_index}", description="Test task", status=TaskStatus.CREATED, priority=1, user=user, created_at=now, updated_at=now))
+        await db.commit()
+    
+    # The test client runs the application in its own event loop
+    await database.async_engine.dispose()
+    return admin
+
+
+@pytest.fixture(scope="session")
+def admin() -> User:
+    return asyncio.run(seed())
+
+
+@pytest.fixture(scope="session")
+def client(admin: User):
+    with TestClient(app) as test_client:
+        test_client.headers["Authorization"] = f"Bearer {AuthService.create_access_token(admin)}"
+        yield test_client
+        # Pooled aiosqlite connections hold threads that would keep the interpreter alive
+        test_client.portal.call(database.async_engine.dispose)
+
+
+@pytest.fixture
+def statements():
+    """Statements sent to the database while the fixture is active"""
+    executed = []
+    
+    def record(conn, cursor, statement, *_):
+        executed.append(statement)
+    
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(database.async_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def parameters():
+    """Parameters of the statements sent to the database while the fixture is active
+    
+    The values are taken before the dialect's bind processing, as the driver
+    of another dialect would receive them: SQLite turns datetimes into strings.
+    """
+    executed = []
+    
+    def record(conn, cursor, statement, params, context, executemany):
+        if context.compiled is not None:
+            executed.extend(context.compiled_parameters)
+    
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(database.async_engine.sync_engine, "before_cursor_execute", record)
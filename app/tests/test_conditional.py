@@ -0,0 +1,34 @@
+"""ETags of entity endpoints and If-Match preconditions"""
+
+
+def test_full_record_has_a_strong_etag_usable_with_if_match(client):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    etag = client.get(f"/companies/{company_id}").headers["ETag"]
+    assert not etag.startswith("W/")
+    
+    response = client.put(f"/companies/{company_id}", json={"rating": 5}, headers={"If-Match": etag})
+    
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert client.get(f"/companies/{company_id}").headers["ETag"] == response.headers["ETag"]
+    assert client.put(f"/companies/{company_id}", json={"rating": 4}, headers={"If-Match": etag}).status_code == 412
+
+
+def test_if_match_never_matches_a_weak_etag(client):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    etag = client.get(f"/companies/{company_id}").headers["ETag"]
+    
+    response = client.put(f"/companies/{company_id}", json={"rating": 3}, headers={"If-Match": f"W/{etag}"})
+    
+    assert response.status_code == 412
+
+
+def test_partial_records_have_weak_etags_compared_weakly_for_if_none_match(client):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    
+    response = client.get(f"/companies/{company_id}", params={"include": "users"})
+    assert response.headers["ETag"].startswith("W/")
+    assert client.get(f"/companies/{company_id}", params={"fields": "name"}).headers["ETag"].startswith("W/")
+    
+    etag = client.get(f"/companies/{company_id}").headers["ETag"]
+    assert client.get(f"/companies/{company_id}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
@@ -0,0 +1,49 @@
+"""?include= expansion loads related records in a fixed number of queries, whatever the page size"""
+
+import pytest
+
+from tests.conftest import COMPANIES, TASKS_PER_USER, USERS_PER_COMPANY
+
+
+@pytest.mark.parametrize("path, include, queries", [
+    ("/companies", None, 1),
+    ("/companies", "users", 2),
+    ("/companies", "users.tasks", 3),
+    ("/users", None, 1),
+    ("/users", "company", 1),
+    ("/users", "company,tasks", 2),
+    ("/tasks", None, 1),
+    ("/tasks", "user.company", 1),
+])
+def test_list_include_query_count(client, statements, path, include, queries):
+    params = {"size": 50}
+    if include is not None:
+        params["include"] = include
+    
+    response = client.get(path, params=params)
+    
+    assert response.status_code == 200
+    assert len(response.json()) > 1
+    assert len(statements) == queries
+
+
+def test_list_include_returns_nested_records(client, statements):
+    response = client.get("/companies", params={"size": 50, "include": "users.tasks"})
+    
+    companies = response.json()
+    assert len(companies) == COMPANIES
+    for company in companies:
+        assert len(company["users"]) == USERS_PER_COMPANY
+        assert all(len(user["tasks"]) == TASKS_PER_USER for user in company["users"])
+    assert len(statements) == 3
+
+
+def test_detail_include_query_count(client, statements):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    statements.clear()
+    
+    response = client.get(f"/companies/{company_id}", params={"include": "users.tasks"})
+    
+    assert response.status_code == 200
+    assert len(response.json()["users"]) == USERS_PER_COMPANY
+    assert len(statements) == 3
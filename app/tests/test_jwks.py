@@ -0,0 +1,105 @@
+"""JWKS key management against a local stub of the JWKS endpoint"""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import jwt
+import pytest
+
+from services.jwks import JWKSManager
+
+
+def signing_key(kid: str) -> dict:
+    return {"kty": "oct", "kid": kid, "alg": "HS256", "k": "c2VjcmV0LWtleS1vZi10aGUtdGVzdHM"}
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        # Slow enough for concurrent lookups to overlap with the fetch
+        time.sleep(server.delay)
+        if server.failing:
+            self.send_error(503)
+            return
+        
+        body = json.dumps({"keys": server.keys}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def jwks_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JWKSHandler)
+    server.keys = [signing_key("first")]
+    server.requests = 0
+    server.delay = 0
+    server.failing = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def create_manager(server) -> JWKSManager:
+    return JWKSManager(f"http://127.0.0.1:{server.server_port}/jwks.json", min_refresh_interval=0)
+
+
+def test_keys_are_fetched_at_startup(jwks_server):
+    async def run():
+        manager = create_manager(jwks_server)
+        await manager.start()
+        try:
+            assert jwks_server.requests == 1
+            key = await manager.get_signing_key("first")
+        finally:
+            await manager.stop()
+        return key
+    
+    assert asyncio.run(run()).key_id == "first"
+    assert jwks_server.requests == 1
+
+
+def test_concurrent_unknown_kid_lookups_share_one_refresh(jwks_server):
+    async def run():
+        manager = create_manager(jwks_server)
+        await manager.start()
+        try:
+            jwks_server.keys = [signing_key("first"), signing_key("rotated")]
+            jwks_server.delay = 0.2
+            return await asyncio.gather(*[manager.get_signing_key("rotated") for _ in range(10)])
+        finally:
+            await manager.stop()
+    
+    keys = asyncio.run(run())
+    
+    assert {key.key_id for key in keys} == {"rotated"}
+    assert jwks_server.requests == 2
+
+
+def test_failed_refresh_keeps_the_last_good_keys(jwks_server):
+    async def run():
+        manager = create_manager(jwks_server)
+        await manager.start()
+        try:
+            jwks_server.failing = True
+            assert not await manager.refresh()
+            key = await manager.get_signing_key("first")
+            with pytest.raises(jwt.PyJWKClientError):
+                await manager.get_signing_key("unknown")
+        finally:
+            await manager.stop()
+        return key
+    
+    assert asyncio.run(run()).key_id == "first"
+    assert jwks_server.requests == 3
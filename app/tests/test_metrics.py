@@ -0,0 +1,20 @@
+"""GET /metrics only answers scrapers sending the metrics token"""
+
+import pytest
+
+
+@pytest.mark.parametrize("authorization", ["", "Bearer wrong-token"])
+def test_metrics_reject_missing_and_wrong_tokens(client, authorization):
+    assert client.get("/metrics", headers={"Authorization": authorization}).status_code == 401
+
+
+def test_metrics_reject_user_access_tokens(client):
+    # The client sends the access token of an admin by default
+    assert client.get("/metrics").status_code == 401
+
+
+def test_metrics_accept_the_metrics_token(client):
+    response = client.get("/metrics", headers={"Authorization": "Bearer test-metrics-token"})
+    
+    assert response.status_code == 200
+    assert "http_response_size_bytes_total" in response.text
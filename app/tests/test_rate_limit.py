@@ -0,0 +1,26 @@
+"""Login token buckets"""
+
+import asyncio
+
+import pytest
+
+from services.exception import TooManyRequestsError
+from services.rate_limit import MemoryRateLimit, TokenBucketLimiter
+
+
+async def hit(limiter: TokenBucketLimiter, attempts: int) -> None:
+    for _ in range(attempts):
+        await limiter.hit("alice")
+
+
+def test_empty_bucket_is_rejected():
+    limiter = TokenBucketLimiter("test", MemoryRateLimit(10), capacity=2, per_minute=1)
+    
+    with pytest.raises(TooManyRequestsError):
+        asyncio.run(hit(limiter, 3))
+
+
+def test_zero_rate_disables_the_limiter():
+    limiter = TokenBucketLimiter("test", MemoryRateLimit(10), capacity=2, per_minute=0)
+    
+    asyncio.run(hit(limiter, 10))
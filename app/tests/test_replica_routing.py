@@ -0,0 +1,92 @@
+"""Reads of replica sessions are routed to a read replica, a copy of the test database"""
+
+from itertools import cycle
+import os
+import sqlite3
+from uuid import UUID
+
+import pytest
+from sqlalchemy import event, select, update
+
+import database
+from entities.company import Company, CompanyMode
+from services import company as CompanyService
+from services import utils
+
+
+@pytest.fixture
+def replica(client, monkeypatch):
+    """Statements sent to the replica while the fixture is active"""
+    primary_path = database.async_engine.url.database
+    path = os.path.join(os.path.dirname(primary_path), "replica.sqlite")
+    source, target = sqlite3.connect(primary_path), sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    
+    engine = database.create_async_database_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(database, "replica_engines", [engine])
+    monkeypatch.setattr(database, "replica_cycle", cycle([engine]))
+    executed = []
+    
+    def record(conn, cursor, statement, *_):
+        executed.append(statement)
+    
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    client.portal.call(engine.dispose)
+
+
+def test_list_reads_go_to_the_replica(client, statements, replica):
+    response = client.get("/companies")
+    
+    assert response.status_code == 200
+    assert len(replica) == 1
+    assert statements == []
+
+
+def test_detail_reads_go_to_the_replica_and_are_not_cached(client, statements, replica):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    client.portal.call(CompanyService.cache.invalidate, [UUID(company_id)])
+    replica.clear()
+    
+    response = client.get(f"/companies/{company_id}")
+    
+    assert response.status_code == 200
+    assert len(replica) == 1
+    assert statements == []
+    assert client.portal.call(CompanyService.cache.get, UUID(company_id)) is None
+
+
+async def read_after_dml(company_id: UUID) -> None:
+    async with database.AsyncSessionLocal(info={"replica": True}) as db:
+        await db.scalars(select(Company).filter(Company.id == company_id))
+        await db.execute(update(Company).filter(Company.id == company_id).values(rating=Company.rating))
+        await db.scalars(select(Company).filter(Company.id == company_id))
+        await db.rollback()
+
+
+async def read_after_flush() -> None:
+    async with database.AsyncSessionLocal(info={"replica": True}) as db:
+        now = utils.get_current_utc_time()
+        db.add(Company(name="Pinned", description="Test company", mode=CompanyMode.PENDING, rating=0, created_at=now, updated_at=now))
+        await db.flush()
+        await db.scalars(select(Company).filter(Company.name == "Pinned"))
+        await db.rollback()
+
+
+def test_session_is_pinned_to_the_primary_after_dml(client, statements, replica):
+    company_id = UUID(client.get("/companies", params={"size": 1}).json()[0]["id"])
+    replica.clear()
+    
+    client.portal.call(read_after_dml, company_id)
+    
+    assert len(replica) == 1
+    assert [statement.split()[0] for statement in statements] == ["UPDATE", "SELECT"]
+
+
+def test_session_is_pinned_to_the_primary_after_a_flush(client, statements, replica):
+    client.portal.call(read_after_flush)
+    
+    assert replica == []
+    assert [statement.split()[0] for statement in statements] == ["INSERT", "SELECT"]
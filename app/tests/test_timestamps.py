@@ -0,0 +1,83 @@
+"""Timestamps are bound as naive UTC datetimes, like the `timestamp without time zone` columns
+
+asyncpg rejects aware datetimes for these columns, SQLite accepts both, so the
+parameters are checked before SQLite's bind processing.
+"""
+
+from datetime import datetime
+
+import database
+from services import jobs
+from services.refresh_token import refresh_token_purger
+from services.user import HASH_DEFAULT_PASSWORDS_JOB
+
+
+def aware_datetimes(parameters) -> list:
+    values = [value for params in parameters for value in params.values()]
+    return [value for value in values if isinstance(value, datetime) and value.tzinfo is not None]
+
+
+def test_company_writes_bind_naive_timestamps(client, parameters):
+    response = client.post("/companies", json={"name": "Timestamps", "description": "Test company"})
+    assert response.status_code == 201
+    company_id = response.json()["id"]
+    
+    assert client.put(f"/companies/{company_id}", json={"rating": 4}).status_code == 200
+    assert client.post("/companies/bulk", json=[{"name": "Bulk timestamps", "description": "Test company"}]).status_code == 200
+    
+    assert parameters
+    assert aware_datetimes(parameters) == []
+
+
+def test_user_and_task_writes_bind_naive_timestamps(client, parameters):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    
+    response = client.post("/users", json={"first_name": "Naive", "last_name": "Time", "company_id": company_id})
+    assert response.status_code == 201
+    user_id = response.json()["id"]
+    assert client.put(f"/users/{user_id}", json={"is_active": False}).status_code == 200
+    
+    response = client.post("/tasks", json={"summary": "Timestamps", "user_id": user_id})
+    assert response.status_code == 201
+    assert client.put(f"/tasks/{response.json()['id']}", json={"priority": 2}).status_code == 200
+    
+    assert aware_datetimes(parameters) == []
+
+
+def test_refresh_token_writes_bind_naive_timestamps(client, parameters):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    user = client.post("/users", json={"first_name": "Refresh", "last_name": "Token", "company_id": company_id}).json()
+    assert client.put(f"/users/{user['id']}", json={"password": "p@ssw0rd"}).status_code == 200
+    
+    response = client.post("/auth/token", data={"username": user["username"], "password": "p@ssw0rd"})
+    assert response.status_code == 200
+    response = client.post("/auth/refresh", json={"refresh_token": response.json()["refresh_token"]})
+    assert response.status_code == 200
+    assert client.post("/auth/revoke", json={"refresh_token": response.json()["refresh_token"]}).status_code == 204
+    client.portal.call(refresh_token_purger.purge)
+    
+    assert aware_datetimes(parameters) == []
+
+
+async def enqueue_and_run_job() -> None:
+    queue = jobs.PostgresJobQueue(workers=1, drain_timeout=1, sweep_interval=0, poll_interval=1)
+    async with database.AsyncSessionLocal() as db:
+        await queue.enqueue(HASH_DEFAULT_PASSWORDS_JOB, {"user_ids": []}, db)
+        await db.commit()
+    assert await queue._run_next()
+
+
+def test_job_writes_bind_naive_timestamps(client, parameters):
+    client.portal.call(enqueue_and_run_job)
+    client.portal.call(jobs.sweep)
+    
+    assert aware_datetimes(parameters) == []
+
+
+def test_created_user_timestamps_match_the_stored_ones(client):
+    company_id = client.get("/companies", params={"size": 1}).json()[0]["id"]
+    created = client.post("/users", json={"first_name": "Same", "last_name": "Time", "company_id": company_id}).json()
+    
+    stored = client.get(f"/users/{created['id']}").json()
+    
+    assert (created["created_at"], created["updated_at"]) == (stored["created_at"], stored["updated_at"])